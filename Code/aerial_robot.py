@@ -11,7 +11,9 @@ init_pos = (41,41,np.pi/4) # starting pose of the robots
 
 # Braitenberg vehicle
 class Aerial_Robot:
-    def __init__(self, store_traj=False):
+    # store_traj: True = all positions are stored in traj
+    # num_steps: expected number of time steps, used to size the trajectory buffer
+    def __init__(self, store_traj=False, num_steps=None):
         self.x_pos = init_pos[0]
         self.y_pos = init_pos[1]
         self.theta = init_pos[2]
@@ -48,27 +50,37 @@ class Aerial_Robot:
 
         self.store_traj = store_traj
         if store_traj:
-            self.traj = ([],[])
-
-    def setup(self, map_size,genome, config, rand_init=False):
-        if rand_init:
-            # start at random position with random orientation
-            self.x_pos = np.random.uniform(0, map_size[0])
-            self.y_pos = np.random.uniform(0, map_size[1])
-            self.theta = np.random.uniform(0, 2*np.pi)
-        else:
-            # start at fixed position
-            self.x_pos = init_pos[0]
-            self.y_pos = init_pos[1]
-            self.theta = init_pos[2]
+            # x and y positions, the buffer is enlarged if more positions than expected are stored
+            self.traj_buffer = np.zeros((2, (num_steps or 400) + 2))
+            self.traj_len = 0
 
+    # net: prebuilt network of the genome, None = build it from the genome
+    # start_pose: (x, y, theta) the robot starts at, None = draw it with draw_start_pose
+    def setup(self, map_size,genome, config, rand_init=False, net=None, start_pose=None):
+        if start_pose is None:
+            start_pose = Aerial_Robot.draw_start_pose(map_size, rand_init)
+        self.x_pos, self.y_pos, self.theta = start_pose
 
         # save starting position
         self.start_pose = [self.x_pos, self.y_pos, self.theta]
 
-        self.net = neat.nn.FeedForwardNetwork.create(genome,config)
+        if net is None:
+            net = neat.nn.FeedForwardNetwork.create(genome,config)
+        self.net = net
 
 
+    # return starting pose (x, y, theta) of an aerial robot
+    @staticmethod
+    def draw_start_pose(map_size, rand_init=False):
+        if rand_init:
+            # start at random position with random orientation
+            x_pos = np.random.uniform(0, map_size[0])
+            y_pos = np.random.uniform(0, map_size[1])
+            theta = np.random.uniform(0, 2*np.pi)
+            return x_pos, y_pos, theta
+        # start at fixed position
+        return init_pos[0], init_pos[1], init_pos[2]
+
     # execute robot behaviour, returns desired linear and angular velocities of the robot
     def update(self):
 
@@ -106,11 +118,12 @@ class Aerial_Robot:
     # get relative distance/angle to input position
     def get_distance_and_angle(self, pos):
         dist = np.sqrt((self.x_pos-pos[0])**2 + (self.y_pos - pos[1])**2)
-        angle = np.arccos((pos[1]-self.y_pos)/dist)
-
-        if pos[0] < self.x_pos:
-            angle = 2*np.pi - angle
-
+        if dist == 0:
+            return dist, np.nan
+        # angle between the y axis and the direction to pos
+        angle = np.arctan2(pos[0]-self.x_pos, pos[1]-self.y_pos)
+        if angle < 0:
+            angle = 2* np.pi + angle
         # angle in robot coordinates
         angle = angle - self.theta
         if angle < 0:
@@ -131,5 +144,12 @@ class Aerial_Robot:
 
         # save trajectory
         if self.store_traj:
-            self.traj[0].append(px)
-            self.traj[1].append(py)
+            if self.traj_len == self.traj_buffer.shape[1]:
+                self.traj_buffer = np.concatenate((self.traj_buffer, np.zeros_like(self.traj_buffer)), axis=1)
+            self.traj_buffer[:, self.traj_len] = (px, py)
+            self.traj_len += 1
+
+    # stored trajectory as tuple of x and y positions
+    @property
+    def traj(self):
+        return (self.traj_buffer[0, :self.traj_len], self.traj_buffer[1, :self.traj_len])
@@ -0,0 +1,249 @@
+import numpy as np
+import neat
+from ground_robot import Ground_Robot, Compiled_Controller
+from aerial_robot import Aerial_Robot
+from simulator import draw_scenario, distance_and_angle, sector_index
+
+
+# return one boolean mask per sensor sector, sectors are centered around the robot orientation
+# and each covers 2*pi/num_sectors (an undefined angle (nan) is in no sector), same comparisons as
+# the sensors of Simulator for single objects
+def sector_masks(angle, num_sectors):
+    half = np.pi/num_sectors
+    masks = [(angle < half) | (angle > 2*np.pi - half)]
+    left = ~masks[0]
+    for k in range(1, num_sectors):
+        m = left & (angle < (2*k+1)*half)
+        masks.append(m)
+        left = left & ~m
+    return masks
+
+
+class BatchSimulator:
+    # initialize simulator for many pairs of robots which are simulated in lockstep
+    # genomes_ground, genomes_aerial: lists of genomes, pair i consists of genomes_ground[i] and genomes_aerial[i]
+    # config_ground, config_aerial: config files of robots
+    # the other parameters have the same meaning as for Simulator, initial poses and token of the pairs
+    # are drawn in the same order as a sequence of Simulator objects would draw them
+    # compiled_controller: True = outputs of the ground networks are looked up in one table per genome
+    # batched_networks: True = the networks of all pairs are evaluated together (neat.nn.BatchedNetworks), results
+    # equal those of single networks up to floating point rounding
+    # nets_ground, nets_aerial: lists with a prebuilt network (ground: or Compiled_Controller) of each genome, None = build them
+    # scenarios: list with the Scenario of each pair (all with the same number of token), None = draw them
+    def __init__(self, genomes_ground, genomes_aerial, config_ground, config_aerial, arena_size=(550,350), rand_init = False, rand_token = False, map_bounded = False, token_per_area = 1, compiled_controller = False, batched_networks = False, nets_ground = None, nets_aerial = None, scenarios = None):
+        assert len(genomes_ground) == len(genomes_aerial)
+        self.num_pairs = n = len(genomes_ground)
+        self.map_size_x, self.map_size_y = arena_size
+        self.timestep = 1
+        self.bounded = map_bounded
+
+        # sensor ranges and velocity limits are taken from the robot classes
+        ground_robot = Ground_Robot()
+        aerial_robot = Aerial_Robot()
+        self.c_range = ground_robot.c_range
+        self.t_range = ground_robot.t_range
+        self.a_range = ground_robot.a_range
+        self.ground_v_max = ground_robot.v_max
+        self.ground_w_max = ground_robot.w_max
+        self.d_range = aerial_robot.d_range
+        self.g_range = aerial_robot.g_range
+        self.aerial_v_max = aerial_robot.v_max
+        self.aerial_w_max = aerial_robot.w_max
+
+        # build the network of each genome only once, even if it is part of several pairs
+        if nets_ground is None:
+            nets_ground = self.create_nets(genomes_ground, config_ground)
+        if nets_aerial is None:
+            nets_aerial = self.create_nets(genomes_aerial, config_aerial)
+        self.nets_ground = [net.net if isinstance(net, Compiled_Controller) else net for net in nets_ground]
+        self.nets_aerial = nets_aerial
+        self.compiled_controller = compiled_controller
+        if compiled_controller:
+            self.ground_tables, self.ground_table_index = self.create_tables(nets_ground)
+        self.batched_networks = batched_networks
+        if batched_networks:
+            self.batched_ground = neat.nn.BatchedNetworks(self.nets_ground)
+            self.batched_aerial = neat.nn.BatchedNetworks(self.nets_aerial)
+
+        # poses of all robots
+        self.ground_pose = np.zeros((n, 3))
+        self.aerial_pose = np.zeros((n, 3))
+        if scenarios is None:
+            scenarios = [draw_scenario(arena_size, rand_init, rand_token, token_per_area) for i in range(n)]
+        assert len(scenarios) == n
+        token = []
+        for i, scenario in enumerate(scenarios):
+            self.ground_pose[i] = scenario.ground_pose
+            self.aerial_pose[i] = scenario.aerial_pose
+            token.append(scenario.token)
+        # set aerial robots near to ground robots
+        self.aerial_pose[:, :2] = self.ground_pose[:, :2] + 1
+
+        # token positions (pair, token, x/y) and whether a token is not collected yet
+        self.token = np.array(token, dtype=float).reshape(n, -1, 2)
+        self.token_alive = np.ones(self.token.shape[:2], dtype=bool)
+        self.collected_token = np.zeros(n, dtype=int)
+
+        # sensor inputs: gi1..gi4, ga1..ga4 of the ground robots and ai1..ai6, ag1..ag6, acd, aca of the aerial robots
+        self.ground_inputs = np.zeros((n, 8))
+        self.aerial_inputs = np.zeros((n, 14))
+
+    # return list with a network for each genome, genomes occurring several times share their network
+    @staticmethod
+    def create_nets(genomes, config):
+        nets = {}
+        for g in genomes:
+            if id(g) not in nets:
+                nets[id(g)] = neat.nn.FeedForwardNetwork.create(g, config)
+        return [nets[id(g)] for g in genomes]
+
+    # return array with the lookup tables (see Compiled_Controller) of the distinct networks
+    # and the index of the table belonging to each network in the list, tables of Compiled_Controllers are reused
+    @staticmethod
+    def create_tables(nets):
+        tables = {}
+        index = []
+        for net in nets:
+            if id(net) not in tables:
+                controller = net if isinstance(net, Compiled_Controller) else Compiled_Controller(net)
+                tables[id(net)] = (len(tables), controller.table)
+            index.append(tables[id(net)][0])
+        return np.array([t for i, t in sorted(tables.values(), key=lambda x: x[0])]), np.array(index, dtype=int)
+
+    # activate each network with its row of the input matrix
+    @staticmethod
+    def activate(nets, inputs):
+        return np.array([net.activate(x) for net, x in zip(nets, inputs.tolist())])
+
+    # simulate one time step for all pairs, returns 1 if all pairs collected all token
+    def step(self):
+        self.movement_ground_robots()
+        self.token_sensors_ground_robots()
+        self.ar_sensors_ground_robots()
+        self.movement_aerial_robots()
+        self.token_sensors_aerial_robots()
+        self.center_sensor_aerial_robots()
+        self.gr_sensors_aerial_robots()
+
+        if not self.token_alive.any():
+            return 1
+
+    # simulate up to num_steps time steps and return the number of collected token of each pair
+    def run(self, num_steps):
+        for i in range(num_steps):
+            if self.step() == 1:
+                break
+        return self.collected_token.copy()
+
+    # clip positions into map boundaries
+    def clip(self, x_pos, y_pos):
+        if self.bounded:
+            x_pos = np.clip(x_pos, 0, self.map_size_x)
+            y_pos = np.clip(y_pos, 0, self.map_size_y)
+        return x_pos, y_pos
+
+    # return outputs of the ground networks for the current sensor inputs
+    def activate_ground_robots(self):
+        inputs = self.ground_inputs
+        if self.compiled_controller and np.all((inputs == 0) | (inputs == 1)):
+            index = inputs.astype(int) @ (1 << np.arange(8))
+            return self.ground_tables[self.ground_table_index, index]
+        # fall back to the networks for non-binary inputs
+        if self.batched_networks:
+            return self.batched_ground.activate(inputs)
+        return self.activate(self.nets_ground, inputs)
+
+    # move ground robots (one timestep)
+    def movement_ground_robots(self):
+        out = self.activate_ground_robots()
+        v = out[:, 0]*self.ground_v_max
+        w = out[:, 1]*self.ground_w_max
+
+        x, y, theta = self.ground_pose.T
+        x_pos_new = x + v * self.timestep * np.cos(theta)
+        y_pos_new = y + v * self.timestep * np.sin(theta)
+        x_pos_new, y_pos_new = self.clip(x_pos_new, y_pos_new)
+
+        theta = np.mod(theta + w * self.timestep, 2*np.pi)
+        self.ground_pose = np.stack((x_pos_new, y_pos_new, theta), axis=1)
+
+    # move aerial robots (one timestep)
+    def movement_aerial_robots(self):
+        if self.batched_networks:
+            out = self.batched_aerial.activate(self.aerial_inputs)
+        else:
+            out = self.activate(self.nets_aerial, self.aerial_inputs)
+        v_front = np.clip(out[:, 0]*self.aerial_v_max, -self.aerial_v_max, self.aerial_v_max)
+        v_side = np.clip(out[:, 1]*self.aerial_v_max, -self.aerial_v_max, self.aerial_v_max)
+        v_rotation = np.clip(out[:, 2]*self.aerial_w_max, -self.aerial_w_max, self.aerial_w_max)
+
+        # transform velocities from robot to world coordinates
+        x, y, theta = self.aerial_pose.T
+        ct = np.cos(theta)
+        st = np.sin(theta)
+        x_pos_new = (x + v_front*ct - v_side*st) * self.timestep
+        y_pos_new = (y + v_side*ct + v_front*st) * self.timestep
+        x_pos_new, y_pos_new = self.clip(x_pos_new, y_pos_new)
+
+        theta = np.mod(theta + v_rotation * self.timestep, 2*np.pi)
+        self.aerial_pose = np.stack((x_pos_new, y_pos_new, theta), axis=1)
+
+    # set token sensor values of ground robots and collect token in collection range
+    def token_sensors_ground_robots(self):
+        x, y, theta = self.ground_pose[:, :, None].transpose(1, 0, 2)
+        dist = np.sqrt((x-self.token[:, :, 0])**2 + (y-self.token[:, :, 1])**2)
+        in_range = dist < self.t_range
+        sectors = sector_index(x, y, theta, self.token[:, :, 0], self.token[:, :, 1], 4)
+
+        # Simulator removes collected token from its list while iterating over it, so the token following
+        # a collected one is neither sensed nor collected in the same step. Token are processed in list order
+        # here to give the same result.
+        sensed = np.zeros_like(self.token_alive)
+        skip = np.zeros(self.num_pairs, dtype=bool)
+        for j in range(self.token.shape[1]):
+            alive = self.token_alive[:, j]
+            evaluated = alive & ~skip
+            collect = evaluated & (dist[:, j] < self.c_range)
+            sensed[:, j] = evaluated & ~collect & in_range[:, j]
+            skip = np.where(alive, collect, skip)
+            self.token_alive[:, j] = alive & ~collect
+            self.collected_token += collect
+
+        for k in range(4):
+            self.ground_inputs[:, k] = (sensed & (sectors == k)).any(axis=1)
+
+    # set sensor values of ground robots to detect aerial robots
+    def ar_sensors_ground_robots(self):
+        x, y, theta = self.ground_pose.T
+        dist, angle = distance_and_angle(x, y, theta, self.aerial_pose[:, 0], self.aerial_pose[:, 1])
+        in_range = dist < self.a_range
+        for k, m in enumerate(sector_masks(angle, 4)):
+            self.ground_inputs[:, 4+k] = in_range & m
+
+    # set the token sensor values of aerial robots
+    def token_sensors_aerial_robots(self):
+        x, y, theta = self.aerial_pose[:, :, None].transpose(1, 0, 2)
+        dist = np.sqrt((x-self.token[:, :, 0])**2 + (y-self.token[:, :, 1])**2)
+        rel_dist = 1-dist/self.d_range
+        in_range = self.token_alive & (dist < self.d_range) & (dist > 0)
+        sectors = sector_index(x, y, theta, self.token[:, :, 0], self.token[:, :, 1], 6)
+        for k in range(6):
+            self.aerial_inputs[:, k] = np.where(in_range & (sectors == k), rel_dist, 0).max(axis=1)
+
+    # set sensor values of aerial robots to detect ground robots
+    def gr_sensors_aerial_robots(self):
+        x, y, theta = self.aerial_pose.T
+        dist, angle = distance_and_angle(x, y, theta, self.ground_pose[:, 0], self.ground_pose[:, 1])
+        rel_dist = 1-dist/self.g_range
+        in_range = dist < self.g_range
+        for k, m in enumerate(sector_masks(angle, 6)):
+            self.aerial_inputs[:, 6+k] = np.where(in_range & m, rel_dist, 0)
+
+    # set sensor values of aerial robots to detect the center of map
+    def center_sensor_aerial_robots(self):
+        center_x = self.map_size_x/2
+        center_y = self.map_size_y/2
+        x, y, theta = self.aerial_pose.T
+        dist, angle = distance_and_angle(x, y, theta, center_x, center_y)
+        self.aerial_inputs[:, 12] = dist/np.sqrt(center_x**2 + center_y**2)
+        self.aerial_inputs[:, 13] = angle
@@ -0,0 +1,26 @@
+# convert the pickled genome arrays of existing results (results_best_*.npz, results_full_pop_*.npz)
+# into genome archives (see genome_archive.py) next to them
+
+import numpy as np
+import glob
+import os
+from genome_archive import save_genomes, EXTENSION
+
+folder_name = '../Results/'
+remove_npz = False # delete the .npz files after their conversion
+
+
+def convert(load_name):
+    results = np.load(load_name, allow_pickle=True)
+    arrays = [results['arr_'+str(i)] for i in range(len(results.files))]
+    save_name = load_name[:-len('.npz')] + EXTENSION
+    save_genomes(save_name, arrays)
+    print(load_name + ': ' + str(os.path.getsize(load_name)) + ' -> ' + str(os.path.getsize(save_name)) + ' bytes')
+    if remove_npz:
+        os.remove(load_name)
+
+
+if __name__ == '__main__':
+    for pattern in ['results_best_*.npz', 'results_full_pop_*.npz']:
+        for load_name in sorted(glob.glob(folder_name + pattern)):
+            convert(load_name)
@@ -3,12 +3,14 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-import copy
 from ground_robot import Ground_Robot
 from aerial_robot import Aerial_Robot
-from simulator import Simulator
+from simulator import Simulator, is_deterministic
+from batch_simulator import BatchSimulator
 import os
 import neat
+from genome_archive import load_genomes
+from pair_evaluation import evaluate_pairs
 
 init_pos = ((40,40,np.pi/4)) # starting pose of the robots
 sim_steps = 400 # two time steps per second
@@ -16,11 +18,17 @@ folder_name = '../Results/'
 file_name = 'results_'
 results_best_name = 'results_best_'
 token_per_area = 1
+map_x = 550
+map_y = 350
 
 random_inits = False
 rand_token = False
 map_bounded = True
 amount_runs = 1 #50
+batch_simulation = True # simulate all pairs of a file in lockstep
+num_workers = 1 # > 1: the pairs are simulated in this many worker processes
+
+parallel_evaluator = None
 
 
 
@@ -37,48 +45,47 @@ def save_plot(config_ground,config_aerial, load_name, load_name_pairs, save_name
 
     max_avg, min_avg, avg_avg = res[:3]
 
-    # load best pairs
-    results_pairs = np.load(load_name_pairs, allow_pickle=True)
+    # load best pairs (genome archive or .npz)
+    results_pairs = load_genomes(load_name_pairs)
 
     res_pairs = []
     for i in range(len(results_pairs.files)):
         res_pairs.append(results_pairs['arr_'+str(i)])
 
 
-    max_fitn = []
-    avg_fitn = []
-    min_fitn = []
-    best_avg_pair = []
-
-    for p in range(0,len(res_pairs[0])):
-        if p % 50 == 0:
-            print(p)
-        genome_ground_robot_best = res_pairs[0][p][0]
-        genome_aerial_robot_best = res_pairs[0][p][1]
-
-        # create robots, simulator, ...
-        map_x = 550
-        map_y = 350
-        temp_fitn = []
-        for x in range(0,amount_runs):
-            simulator = Simulator(genome_ground_robot_best, genome_aerial_robot_best, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = random_inits, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area,store_traj=True)
+    # evaluate the best pairs of all generations, every distinct pair is simulated once (see pair_evaluation.py)
+    # a deterministic scenario gives the same result in each run, so it is simulated only once
+    num_evals = 1 if is_deterministic(random_inits, rand_token) else amount_runs
+    simulate = lambda pairs, n: simulate_pairs(pairs, config_ground, config_aerial, n)
+    max_fitn, avg_fitn, min_fitn, best_avg_pair = evaluate_pairs(res_pairs[0][...], simulate, num_evals)
 
+    # save the results as .npz file, written under a temporary name first so that only complete files exist
+    np.savez(save_name+'.tmp.npz', max_avg, min_avg, avg_avg, [best_avg_pair[0]],[best_avg_pair[1]],avg_fitn)
+    os.replace(save_name+'.tmp.npz', save_name+'.npz')
 
-            token = copy.deepcopy(simulator.token)
-            for s in range(0,sim_steps):
-                simulator.step()
-            # add to list
-            temp_fitn.append(simulator.ground_robot.collected_token)
+# calculate fitness of a pair of robots
+def calc_fitness(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial):
+    simulator = Simulator(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = random_inits, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area, collect_metrics = False)
+    for s in range(0,sim_steps):
+        simulator.step()
+    return simulator.ground_robot.collected_token
 
-        max_fitn.append(np.amax(temp_fitn))
-        avg_fitn.append(np.average(temp_fitn))
-        min_fitn.append(np.amin(temp_fitn))
-        if np.amax(avg_fitn) == avg_fitn[-1]:
-            best_avg_pair=[genome_ground_robot_best, genome_aerial_robot_best]
-
-
-    # save the results as .npz file
-    np.savez(save_name, max_avg, min_avg, avg_avg, [best_avg_pair[0]],[best_avg_pair[1]],avg_fitn)
+# simulate each (ground genome, aerial genome) pair in the list num_evals times, returns array (pairs, num_evals) with the results
+def simulate_pairs(pairs, config_ground, config_aerial, num_evals):
+    global parallel_evaluator
+    print("Simulate "+str(len(pairs))+" distinct pairs "+str(num_evals)+" times")
+    if num_workers > 1:
+        if parallel_evaluator is None:
+            parallel_evaluator = neat.CoevolutionParallelEvaluator(num_workers, calc_fitness)
+        return np.array(parallel_evaluator.run_jobs(pairs, None, config_ground, config_aerial, 2, num_evals))
+    grounds = [ground for ground, aerial in pairs for i in range(0,num_evals)]
+    aerials = [aerial for ground, aerial in pairs for i in range(0,num_evals)]
+    if batch_simulation:
+        simulator = BatchSimulator(grounds, aerials, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = random_inits, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area)
+        fit = simulator.run(sim_steps)
+    else:
+        fit = [calc_fitness(ground, aerial, config_ground, config_aerial) for ground, aerial in zip(grounds, aerials)]
+    return np.array(fit).reshape(len(pairs), num_evals)
 
 
 
@@ -101,7 +108,14 @@ if __name__ == '__main__':
 
         for i in range(0,6):
 
-            load_name_pairs = folder_name+results_best_name+j+'_'+str(i)+'.npz'
+            load_name_pairs = folder_name+results_best_name+j+'_'+str(i)
             load_name = folder_name+file_name+str(j)+'_'+str(i)+'.npz'
             save_name =  folder_name +"new"+str(amount_runs)+"/"+file_name+ j + '_'+str(i)
+            # files evaluated before are kept, so an interrupted evaluation can be continued
+            if os.path.exists(save_name+'.npz'):
+                print("Skip "+save_name+", already evaluated")
+                continue
             save_plot(config_ground,config_aerial,load_name, load_name_pairs, save_name)
+
+    if parallel_evaluator is not None:
+        parallel_evaluator.stop()
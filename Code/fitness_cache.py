@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+
+
+# Stores the fitness of already simulated pairs of ground and aerial genomes.
+# Pairs are identified by the fingerprints (hash of all genes) of both genomes and a description of the
+# scenario, so elites carried into the next generation and unmutated clones of a parent are found again.
+class FitnessCache:
+    # max_size: maximum number of stored pairs, the least recently used pair is evicted first (None = unlimited)
+    def __init__(self, max_size = 100000):
+        self.max_size = max_size
+        self.fitness = OrderedDict()
+        # both populations may use the cache at the same time (concurrent update scheme)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # return key of the pair of genomes with fingerprints (fingerprint_ground, fingerprint_aerial) evaluated
+    # in scenario, scenario None means that the results are random and must not be cached
+    @staticmethod
+    def key(fingerprint_ground, fingerprint_aerial, scenario):
+        if scenario is None:
+            return None
+        return (fingerprint_ground, fingerprint_aerial, scenario)
+
+    # return stored fitness of the pair with this key or None
+    def get(self, key):
+        with self.lock:
+            if key is None or key not in self.fitness:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.fitness.move_to_end(key)
+            return self.fitness[key]
+
+    # store fitness of the pair with this key
+    def put(self, key, fitness):
+        if key is None:
+            return
+        with self.lock:
+            self.fitness[key] = fitness
+            self.fitness.move_to_end(key)
+            if self.max_size is not None:
+                while len(self.fitness) > self.max_size:
+                    self.fitness.popitem(last=False)
+
+    def __len__(self):
+        return len(self.fitness)
+
+    def clear(self):
+        with self.lock:
+            self.fitness.clear()
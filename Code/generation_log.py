@@ -0,0 +1,103 @@
+import os
+import pickle
+import numpy as np
+
+
+# Fixed size record of the statistics file, one record per evaluated population and generation:
+# generation: generation number
+# population: evaluated population (0 = ground, 1 = aerial)
+# max, min, avg: maximum, minimum and average fitness of the evaluated population
+# offset, size: position and length in bytes of the pickled best pair in the genome file
+RECORD_DTYPE = np.dtype([('generation', '<i4'), ('population', '<i1'), ('max', '<f8'), ('min', '<f8'),
+                         ('avg', '<f8'), ('offset', '<i8'), ('size', '<i8')])
+
+
+# Append-only log of a running evolution, written to two files while the run proceeds:
+# <path>.stats: RECORD_DTYPE records of the statistics of each evaluated population, can be memory mapped
+# <path>.genomes: pickled (ground genome, aerial genome) best pairs, one after another
+# The genomes of a record are written before the record, so every complete record refers to complete data
+# and the log can be read while the run is live (see read_stats and Generation_Log_Pairs).
+class GenerationLog:
+    # path: file name without extension
+    # num_records: None starts a new log, otherwise the existing log is continued after its first num_records records
+    # (e.g. when a run is resumed from a checkpoint), later records are removed
+    def __init__(self, path, num_records = None):
+        self.path = path
+        self.offset = 0
+        self.num_records = 0
+        if num_records is None:
+            self.stats_file = open(path + '.stats', 'wb')
+            self.genome_file = open(path + '.genomes', 'wb')
+            return
+        records = read_stats(path)
+        if len(records) < num_records:
+            raise RuntimeError("Generation log {0!r} has {1} records, expected at least {2}".format(path, len(records), num_records))
+        if num_records > 0:
+            self.offset = int(records[num_records-1]['offset'] + records[num_records-1]['size'])
+        del records
+        self.num_records = num_records
+        os.truncate(path + '.stats', num_records * RECORD_DTYPE.itemsize)
+        os.truncate(path + '.genomes', self.offset)
+        self.stats_file = open(path + '.stats', 'ab')
+        self.genome_file = open(path + '.genomes', 'ab')
+
+    # append statistics and best pair of a generation in which population (0 = ground, 1 = aerial) was evaluated
+    def append(self, generation, population, best_ground, best_aerial, max_fitness, min_fitness, avg_fitness):
+        data = pickle.dumps((best_ground, best_aerial), protocol=pickle.HIGHEST_PROTOCOL)
+        self.genome_file.write(data)
+        self.genome_file.flush()
+        record = np.array([(generation, population, max_fitness, min_fitness, avg_fitness, self.offset, len(data))], dtype=RECORD_DTYPE)
+        self.stats_file.write(record.tobytes())
+        self.stats_file.flush()
+        self.offset += len(data)
+        self.num_records += 1
+
+    # return sequence of the best pairs logged so far, read from disk on access
+    def best_pairs(self):
+        return Generation_Log_Pairs(self.path)
+
+    # return lists of the max, min and average fitness of all records logged so far, read from disk
+    def fitness_series(self):
+        records = read_stats(self.path)
+        return records['max'].tolist(), records['min'].tolist(), records['avg'].tolist()
+
+    def __len__(self):
+        return self.num_records
+
+    def close(self):
+        self.stats_file.close()
+        self.genome_file.close()
+
+
+# return memory mapped array with all complete records of the log at path (RECORD_DTYPE),
+# a partially written record at the end of a live log is left out
+def read_stats(path):
+    num_records = os.path.getsize(path + '.stats') // RECORD_DTYPE.itemsize
+    if num_records == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path + '.stats', dtype=RECORD_DTYPE, mode='r', shape=(num_records,))
+
+
+# Best pairs of a generation log as a read-only sequence of (ground genome, aerial genome) tuples,
+# only the requested pairs are loaded. The length is fixed when the sequence is created.
+class Generation_Log_Pairs:
+    def __init__(self, path):
+        self.path = path
+        self.records = read_stats(path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        record = self.records[index]
+        with open(self.path + '.genomes', 'rb') as f:
+            f.seek(int(record['offset']))
+            return pickle.loads(f.read(int(record['size'])))
+
+    def __iter__(self):
+        with open(self.path + '.genomes', 'rb') as f:
+            for record in self.records:
+                f.seek(int(record['offset']))
+                yield pickle.loads(f.read(int(record['size'])))
@@ -0,0 +1,208 @@
+import json
+import numpy as np
+import neat
+from neat.genes import DefaultNodeGene, DefaultConnectionGene
+
+
+# Compact binary storage of genome arrays (DefaultGenome or ArrayGenome), replaces pickled object arrays in .npz files.
+#
+# An archive holds several genome arrays (arr_0, arr_1, ... like np.savez) in one file:
+# MAGIC, the length of the json header as little endian uint64, the json header, then the tables below,
+# each starting at a multiple of ALIGNMENT. All genes of all genomes are stored in two tables, every genome
+# has a row in the genome table pointing to its consecutive nodes and connections. A genome occurring several
+# times (e.g. the partner in the best pairs of many generations) is stored once, also if the occurrences are
+# different objects (e.g. unpickled from the generation log): genomes with the same key, genes and fitness
+# share their row.
+# The tables are memory mapped, so genome k is read without deserializing the others.
+# The type of each genome is an index into the genome type names of the header (archives without the
+# genome_type column hold DefaultGenomes).
+MAGIC = b'GENOMEAR'
+ALIGNMENT = 64
+GENOME_DTYPE = np.dtype([('key', '<i8'), ('fitness', '<f8'), ('node_start', '<i8'), ('node_count', '<i4'),
+                         ('conn_start', '<i8'), ('conn_count', '<i4'), ('genome_type', '<u1')])
+NODE_DTYPE = np.dtype([('key', '<i4'), ('bias', '<f8'), ('response', '<f8'), ('activation', '<u1'), ('aggregation', '<u1')])
+CONNECTION_DTYPE = np.dtype([('in', '<i4'), ('out', '<i4'), ('weight', '<f8'), ('enabled', '?')])
+EXTENSION = '.gar'
+GENOME_TYPES = {'DefaultGenome': neat.DefaultGenome, 'ArrayGenome': neat.ArrayGenome}
+
+
+# save genome arrays (nested lists or object arrays of genomes, None entries are allowed) as archive to path
+def save_genomes(path, arrays):
+    genome_rows = []
+    node_rows = []
+    conn_rows = []
+    names = {'activation': [], 'aggregation': [], 'genome_type': []}
+    row_of_genome = {}
+
+    def name_index(kind, name):
+        if name not in names[kind]:
+            names[kind].append(name)
+        return names[kind].index(name)
+
+    def add(genome):
+        if genome is None:
+            return -1
+        fitness = np.nan if genome.fitness is None else genome.fitness
+        identity = (genome.key, genome.fingerprint(), genome.fitness)
+        if identity not in row_of_genome:
+            row_of_genome[identity] = len(genome_rows)
+            type_name = type(genome).__name__
+            if type_name not in GENOME_TYPES:
+                raise RuntimeError("Genomes of type {0!r} can not be archived".format(type_name))
+            genome_rows.append((genome.key, fitness, len(node_rows), len(genome.nodes), len(conn_rows), len(genome.connections),
+                                name_index('genome_type', type_name)))
+            for key, node in genome.nodes.items():
+                node_rows.append((key, node.bias, node.response, name_index('activation', node.activation), name_index('aggregation', node.aggregation)))
+            for (i, o), conn in genome.connections.items():
+                conn_rows.append((i, o, conn.weight, conn.enabled))
+        return row_of_genome[identity]
+
+    tables = {}
+    for n, array in enumerate(arrays):
+        array = as_object_array(array)
+        tables['arr_'+str(n)] = np.array([add(g) for g in array.flat], dtype='<i8').reshape(array.shape)
+    tables['genomes'] = np.array(genome_rows, dtype=GENOME_DTYPE)
+    tables['nodes'] = np.array(node_rows, dtype=NODE_DTYPE)
+    tables['connections'] = np.array(conn_rows, dtype=CONNECTION_DTYPE)
+    if max(len(names['activation']), len(names['aggregation'])) > 256:
+        raise RuntimeError("Too many different activation or aggregation functions")
+
+    header = {'activation': names['activation'], 'aggregation': names['aggregation'],
+              'genome_types': names['genome_type'], 'num_arrays': len(arrays), 'tables': {}}
+    # the header size depends on the offsets, so they are computed for a generous header size
+    header_size = 1024 + 256 * len(tables)
+    offset = aligned(len(MAGIC) + 8 + header_size)
+    for name, table in tables.items():
+        header['tables'][name] = {'dtype': np.lib.format.dtype_to_descr(table.dtype), 'shape': table.shape, 'offset': offset}
+        offset = aligned(offset + table.nbytes)
+    data = json.dumps(header).encode('utf-8')
+    if len(data) > header_size:
+        raise RuntimeError("Archive header exceeds {0} bytes".format(header_size))
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array([header_size], dtype='<u8').tobytes())
+        f.write(data.ljust(header_size, b' '))
+        for name, table in tables.items():
+            f.seek(header['tables'][name]['offset'])
+            f.write(table.tobytes())
+        f.truncate(offset)
+
+
+# return offset rounded up to the next multiple of ALIGNMENT
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+# return array as numpy object array, genomes are never split into their items
+def as_object_array(array):
+    if isinstance(array, np.ndarray) and array.dtype == object:
+        return array
+    if isinstance(array, GenomeArray):
+        return array[...]
+    rows = list(array)
+    if rows and not isinstance(rows[0], (list, tuple, np.ndarray, GenomeArray)):
+        result = np.empty(len(rows), dtype=object)
+        result[:] = rows
+        return result
+    rows = [as_object_array(row) for row in rows]
+    result = np.empty((len(rows),) + (rows[0].shape if rows else ()), dtype=object)
+    for i, row in enumerate(rows):
+        result[i] = row
+    return result
+
+
+# Read access to an archive written by save_genomes, behaves like the NpzFile returned by np.load:
+# archive.files lists the arrays and archive['arr_0'] returns the first one as GenomeArray.
+class GenomeArchive:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise RuntimeError("{0!r} is not a genome archive".format(path))
+            header_size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            header = json.loads(f.read(header_size).decode('utf-8'))
+        self.activation = header['activation']
+        self.aggregation = header['aggregation']
+        self.genome_types = [GENOME_TYPES[name] for name in header.get('genome_types', [])]
+        self.files = ['arr_'+str(n) for n in range(header['num_arrays'])]
+        self.tables = {}
+        for name, table in header['tables'].items():
+            dtype = np.lib.format.descr_to_dtype(table['dtype'])
+            shape = tuple(table['shape'])
+            if int(np.prod(shape)) == 0:
+                self.tables[name] = np.zeros(shape, dtype=dtype)
+            else:
+                self.tables[name] = np.memmap(path, dtype=dtype, mode='r', offset=table['offset'], shape=shape)
+
+    def __getitem__(self, name):
+        if name not in self.files:
+            raise KeyError(name)
+        return GenomeArray(self, self.tables[name])
+
+    def __len__(self):
+        return len(self.tables['genomes'])
+
+    # return genome in row k of the genome table as DefaultGenome or ArrayGenome like the saved one (None for k = -1)
+    def genome(self, k):
+        k = int(k)
+        if k < 0:
+            return None
+        row = self.tables['genomes'][k]
+        genome = neat.DefaultGenome(int(row['key']))
+        genome.fitness = None if np.isnan(row['fitness']) else float(row['fitness'])
+        start = int(row['node_start'])
+        for key, bias, response, activation, aggregation in self.tables['nodes'][start:start+int(row['node_count'])].tolist():
+            node = DefaultNodeGene(key)
+            node.bias = bias
+            node.response = response
+            node.activation = self.activation[activation]
+            node.aggregation = self.aggregation[aggregation]
+            genome.nodes[key] = node
+        start = int(row['conn_start'])
+        for i, o, weight, enabled in self.tables['connections'][start:start+int(row['conn_count'])].tolist():
+            conn = DefaultConnectionGene((i, o))
+            conn.weight = weight
+            conn.enabled = enabled
+            genome.connections[(i, o)] = conn
+        if 'genome_type' in row.dtype.names and self.genome_types[int(row['genome_type'])] is neat.ArrayGenome:
+            return neat.ArrayGenome.from_genome(genome)
+        return genome
+
+
+# Array of genomes in a GenomeArchive, indexing works like for a numpy object array of genomes:
+# a single element is returned as genome, everything else as object array. Only the indexed
+# genomes are read, a genome occurring several times in one result is built once.
+class GenomeArray:
+    def __init__(self, archive, rows):
+        self.archive = archive
+        self.rows = rows
+        self.shape = rows.shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        rows = self.rows[index]
+        if np.ndim(rows) == 0:
+            return self.archive.genome(rows)
+        genomes = {}
+        result = np.empty(rows.shape, dtype=object)
+        for i, k in np.ndenumerate(rows):
+            if k not in genomes:
+                genomes[k] = self.archive.genome(k)
+            result[i] = genomes[k]
+        return result
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+# return the genome arrays stored under name (without extension): the archive name+EXTENSION if it exists,
+# otherwise the pickled object arrays of name.npz
+def load_genomes(name):
+    try:
+        return GenomeArchive(name + EXTENSION)
+    except FileNotFoundError:
+        return np.load(name + '.npz', allow_pickle=True)
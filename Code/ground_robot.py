@@ -10,9 +10,35 @@ import neat
 init_pos = (40,40,np.pi/4)#(140,130,np.pi/2)
 
 
+# lookup table with the network outputs for all 256 combinations of the binary sensor inputs
+# gi1..gi4, ga1..ga4, inputs other than 0 and 1 are passed to the network itself
+class Compiled_Controller:
+    def __init__(self, net):
+        self.net = net
+        self.table = [tuple(net.activate(Compiled_Controller.inputs_of_index(i))) for i in range(256)]
+
+    # return input vector belonging to a table index (input k is bit k of the index)
+    @staticmethod
+    def inputs_of_index(index):
+        return [(index >> k) & 1 for k in range(8)]
+
+    # return network output for the given inputs
+    def activate(self, inputs):
+        index = 0
+        for k, x in enumerate(inputs):
+            if x == 1:
+                index |= 1 << k
+            elif x != 0:
+                # fall back to the network for non-binary inputs
+                return self.net.activate(inputs)
+        return self.table[index]
+
+
 # Braitenberg vehicle
 class Ground_Robot:
-    def __init__(self, store_traj=False):
+    # store_traj: True = all positions are stored in traj
+    # num_steps: expected number of time steps, used to size the trajectory buffer
+    def __init__(self, store_traj=False, num_steps=None):
         self.x_pos = init_pos[0]
         self.y_pos = init_pos[1]
         self.theta = init_pos[2]
@@ -45,28 +71,50 @@ class Ground_Robot:
 
         self.store_traj = store_traj
         if store_traj:
-            self.traj = ([],[])
-
-    def setup(self, map_size,genome,config, rand_init=False):
-        if rand_init:
-            # start at random corner position with random orientation
-            self.theta = np.random.uniform(0, 2*np.pi)
-            self.x_pos = np.random.choice([40,510])
-            self.y_pos = np.random.choice([40,310])
-        else:
-            # start at fixed position
-            self.x_pos = init_pos[0]
-            self.y_pos = init_pos[1]
-            self.theta = init_pos[2]
+            # x and y positions, the buffer is enlarged if more positions than expected are stored
+            self.traj_buffer = np.zeros((2, (num_steps or 400) + 2))
+            self.traj_len = 0
+
+    # compiled = True: network outputs are looked up in a Compiled_Controller table
+    # net: prebuilt network (or Compiled_Controller) of the genome, None = build it from the genome
+    # start_pose: (x, y, theta) the robot starts at, None = draw it with draw_start_pose
+    def setup(self, map_size,genome,config, rand_init=False, compiled=False, net=None, start_pose=None):
+        if start_pose is None:
+            start_pose = Ground_Robot.draw_start_pose(map_size, rand_init)
+        self.x_pos, self.y_pos, self.theta = start_pose
 
         self.collected_token = 0
         # save starting position
         self.start_pose = [self.x_pos, self.y_pos, self.theta]
         # save net of robot
-        self.net = neat.nn.FeedForwardNetwork.create(genome, config)
+        if net is None:
+            net = Ground_Robot.create_net(genome, config, compiled)
+        self.net = net
+        if compiled and not isinstance(self.net, Compiled_Controller):
+            self.net = Compiled_Controller(self.net)
+
 
 
 
+    # return network of a ground robot with this genome (a Compiled_Controller if compiled = True)
+    @staticmethod
+    def create_net(genome, config, compiled=False):
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        if compiled:
+            return Compiled_Controller(net)
+        return net
+
+    # return starting pose (x, y, theta) of a ground robot
+    @staticmethod
+    def draw_start_pose(map_size, rand_init=False):
+        if rand_init:
+            # start at random corner position with random orientation
+            theta = np.random.uniform(0, 2*np.pi)
+            x_pos = np.random.choice([40,510])
+            y_pos = np.random.choice([40,310])
+            return x_pos, y_pos, theta
+        # start at fixed position
+        return init_pos[0], init_pos[1], init_pos[2]
 
     # execute robot behaviour, returns desired linear and angular velocities of the robot
     def update(self):
@@ -83,10 +131,12 @@ class Ground_Robot:
     def get_distance_and_angle(self, pos):
 
         dist = np.sqrt((self.x_pos-pos[0])**2 + (self.y_pos - pos[1])**2)
-        angle = np.arccos((pos[1]-self.y_pos)/dist)
-
-        if pos[0] < self.x_pos:
-            angle = 2*np.pi - angle
+        if dist == 0:
+            return dist, np.nan
+        # angle between the y axis and the direction to pos
+        angle = np.arctan2(pos[0]-self.x_pos, pos[1]-self.y_pos)
+        if angle < 0:
+            angle = 2* np.pi + angle
         # angle in robot coordinates
         angle = angle - self.theta
         if angle < 0:
@@ -108,5 +158,12 @@ class Ground_Robot:
 
         # save trajectory
         if self.store_traj:
-            self.traj[0].append(px)
-            self.traj[1].append(py)
+            if self.traj_len == self.traj_buffer.shape[1]:
+                self.traj_buffer = np.concatenate((self.traj_buffer, np.zeros_like(self.traj_buffer)), axis=1)
+            self.traj_buffer[:, self.traj_len] = (px, py)
+            self.traj_len += 1
+
+    # stored trajectory as tuple of x and y positions
+    @property
+    def traj(self):
+        return (self.traj_buffer[0, :self.traj_len], self.traj_buffer[1, :self.traj_len])
@@ -1,9 +1,16 @@
 #here I try to implement neat algorithm
 import numpy as np
 import matplotlib.pyplot as plt
-from ground_robot import Ground_Robot
+from ground_robot import Ground_Robot, Compiled_Controller
 from aerial_robot import Aerial_Robot
-from simulator import Simulator
+from simulator import Simulator, is_deterministic
+from batch_simulator import BatchSimulator
+from fitness_cache import FitnessCache
+from phenotype_cache import PhenotypeCache
+from generation_log import GenerationLog
+from genome_archive import save_genomes
+from pair_evaluation import evaluate_pairs
+from scenario_bank import ScenarioBank
 import time
 import os
 import neat
@@ -27,6 +34,32 @@ amount_of_runs = 1 # serial not parallel
 rand_init = False
 rand_token = False
 map_bounded = True
+batch_simulation = True # simulate all pairs of a population in lockstep
+compiled_ground_controller = True # ground robot networks are evaluated once for each binary input and looked up
+batched_networks = False # the networks of all pairs in a BatchSimulator are evaluated in one call (faster, but rounding differs from single networks, so results are not bit-identical to Simulator)
+use_fitness_cache = True # reuse fitness of pairs simulated before (only for deterministic scenarios)
+fitness_cache_size = 100000 # maximum number of pairs in the fitness cache
+num_workers = 1 # > 1: simulations are distributed over this many worker processes
+use_phenotype_cache = True # build the network of each genome once instead of once per simulation
+compiled_networks = False # networks of the phenotype caches evaluate each layer with NumPy (neat.nn.CompiledFeedForwardNetwork), slower for the small networks evolved here
+use_token_grid = False # Simulator finds the token near the robots with a grid (faster for large token_per_area)
+fast_forward_ground = False # Simulator moves the ground robot in closed form while its sensor inputs can not change
+collect_metrics = False # Simulator accumulates the behaviour characteristics (always done with print_behaviour)
+racing = False # genomes with a low provisional fitness after racing_initial_repeats simulations are not simulated further
+racing_initial_repeats = 3 # simulations of every genome before the race is decided (at least 2)
+racing_keep_fraction = 0.5 # fraction of the genomes that get all simulations in any case
+racing_confidence = 1.0 # width of the confidence bounds in standard errors of the provisional mean
+update_scheme = "sequential" # "concurrent": both populations are evaluated at the same time with the best partners of the previous generation
+use_generation_log = True # write statistics and best pairs of each generation to ../Results/results_log_* while the run proceeds
+checkpoint_interval = 10 # save the evolution state to ../Results/checkpoint_* every checkpoint_interval generations (None = never)
+resume_from_checkpoint = False # continue a run from its latest checkpoint if there is one (its configs and run_settings must be the current ones)
+array_genomes = False # genomes keep their genes in sorted NumPy arrays (neat.ArrayGenome) instead of gene objects
+use_scenario_bank = False # all genomes of a population evaluation are simulated in the same scenarios (common random numbers)
+
+fitness_cache = FitnessCache(fitness_cache_size)
+phenotype_cache_ground = PhenotypeCache(lambda genome, config: create_ground_net(genome, config))
+phenotype_cache_aerial = PhenotypeCache(lambda genome, config: create_net(genome, config))
+parallel_evaluators = {}
 
 
 # evaluate pairs of ground and aerial robot
@@ -34,23 +67,223 @@ map_bounded = True
 # type = 0: evaluate all ground robots with best of aerial robots
 # type = 1: evaluate all aerial robots with best of ground robots
 def eval_genomes(pop, ind, config_ground, config_aerial, type = 0):
+    genomes = [genome for genome_id, genome in pop]
+    scenario = scenario_key()
+    if use_fitness_cache and scenario is not None:
+        # take fitness of pairs simulated before from the cache, genomes with identical genes are simulated once
+        pending = {}
+        ind_fingerprint = ind.fingerprint()
+        for genome in genomes:
+            key = pair_key(genome.fingerprint(), ind_fingerprint, type, scenario)
+            fitness = fitness_cache.get(key)
+            if fitness is None:
+                pending.setdefault(key, []).append(genome)
+            else:
+                genome.fitness = fitness
+        genomes = [same[0] for same in pending.values()]
+        eval_genomes_uncached(genomes, ind, config_ground, config_aerial, type)
+        for key, same in pending.items():
+            fitness_cache.put(key, same[0].fitness)
+            for genome in same[1:]:
+                genome.fitness = same[0].fitness
+    else:
+        eval_genomes_uncached(genomes, ind, config_ground, config_aerial, type)
+
+    # networks of genomes that left the evaluated population are not needed anymore
     if type == 0:
-        for genome_id, genome in pop:
-            fit = []
-            for i in range(0,num_evals_per_pair):
-                fit.append(calc_fitness(genome,ind, config_ground, config_aerial))
-            genome.fitness = np.average(fit)
-    elif type == 1:
-        for genome_id, genome in pop:
-            fit = []
-            for i in range(0,num_evals_per_pair):
-                fit.append(calc_fitness(ind, genome, config_ground, config_aerial))
-            genome.fitness = np.average(fit)
+        phenotype_cache_ground.prune(genome_id for genome_id, genome in pop)
+    else:
+        phenotype_cache_aerial.prune(genome_id for genome_id, genome in pop)
+
+# simulate pairs of each genome in the list with ind and set the genome fitness
+def eval_genomes_uncached(genomes, ind, config_ground, config_aerial, type = 0):
+    num_evals = num_simulations(num_evals_per_pair)
+    if racing and num_evals > racing_initial_repeats:
+        eval_genomes_racing(genomes, ind, config_ground, config_aerial, type)
+        return
+    results = simulate_genomes(genomes, ind, config_ground, config_aerial, type, num_evals, draw_scenario_bank(num_evals))
+    for genome, fit in zip(genomes, results):
+        genome.fitness = np.average(fit)
+
+# racing evaluation: each genome is simulated racing_initial_repeats times first, only the top racing_keep_fraction
+# of the genomes by provisional mean and those whose upper confidence bound reaches the provisional mean of the
+# last of them get the remaining simulations. The other genomes keep their provisional mean, shifted below the
+# lowest full mean of the survivors (see racing_fitness).
+# genome.fitness_evals is set to the number of simulations and genome.fitness_full to whether all were run.
+def eval_genomes_racing(genomes, ind, config_ground, config_aerial, type = 0):
+    num_evals = num_simulations(num_evals_per_pair)
+    # with a scenario bank the survivors continue with the scenarios after the initial ones
+    bank = draw_scenario_bank(num_evals)
+    results = simulate_genomes(genomes, ind, config_ground, config_aerial, type, racing_initial_repeats, bank and bank[:racing_initial_repeats])
+    mean = results.mean(axis=1)
+    bound = racing_confidence * results.std(axis=1, ddof=1) / np.sqrt(racing_initial_repeats)
+    num_keep = max(1, int(np.ceil(racing_keep_fraction * len(genomes))))
+    threshold = np.sort(mean)[::-1][num_keep-1]
+    survivors = [i for i in range(len(genomes)) if mean[i] + bound[i] >= threshold]
+
+    rest = simulate_genomes([genomes[i] for i in survivors], ind, config_ground, config_aerial, type, num_evals - racing_initial_repeats, bank and bank[racing_initial_repeats:])
+    full_mean = [np.average(np.concatenate((results[i], fit))) for i, fit in zip(survivors, rest)]
+    for genome, fit in zip(genomes, racing_fitness(mean, survivors, full_mean)):
+        genome.fitness = fit
+        genome.fitness_evals = racing_initial_repeats
+        genome.fitness_full = False
+    for i in survivors:
+        genomes[i].fitness_evals = num_evals
+        genomes[i].fitness_full = True
+
+# fitness of the genomes of a race: survivors get the mean of all their simulations, the other genomes their
+# provisional mean, all shifted by the same amount if needed so that the best of them is just below the lowest
+# survivor. A genome that was only simulated racing_initial_repeats times never outranks a survivor in reproduction
+# (elites, species fitness, parents) or as best genome, and the order of the other genomes is kept.
+# provisional: provisional mean of every genome, survivors: indices of the survivors, full_mean: their full means
+def racing_fitness(provisional, survivors, full_mean):
+    fitness = np.array(provisional, dtype=float)
+    others = np.ones(len(fitness), dtype=bool)
+    others[list(survivors)] = False
+    if len(survivors) > 0 and others.any():
+        cap = np.nextafter(np.min(full_mean), -np.inf)
+        fitness[others] -= max(0.0, fitness[others].max() - cap)
+        fitness[others] = np.minimum(fitness[others], cap)
+    fitness[list(survivors)] = full_mean
+    return fitness
+
+# simulate each genome in the list num_evals times together with ind, returns array (genomes, num_evals) with the results
+# scenarios: list with the Scenario of each repeat shared by all genomes, None = every simulation draws its own
+def simulate_genomes(genomes, ind, config_ground, config_aerial, type, num_evals, scenarios = None):
+    if len(genomes) == 0:
+        return np.zeros((0, num_evals))
+    if num_workers > 1:
+        return np.array(get_parallel_evaluator(type).run_jobs(genomes, ind, config_ground, config_aerial, type, num_evals, scenarios))
+    if batch_simulation:
+        # all simulations of a population run in one BatchSimulator
+        partners = [ind]*(len(genomes)*num_evals)
+        repeated = [genome for genome in genomes for i in range(0,num_evals)]
+        repeated_scenarios = None
+        if scenarios is not None:
+            repeated_scenarios = [scenarios[i] for genome in genomes for i in range(0,num_evals)]
+        if type == 0:
+            fit = calc_fitness_batch(repeated, partners, config_ground, config_aerial, repeated_scenarios)
+        else:
+            fit = calc_fitness_batch(partners, repeated, config_ground, config_aerial, repeated_scenarios)
+        return fit.reshape(len(genomes), num_evals)
+    results = []
+    for genome in genomes:
+        fit = []
+        for i in range(0,num_evals):
+            scenario = None if scenarios is None else scenarios[i]
+            if type == 0:
+                fit.append(calc_fitness(genome,ind, config_ground, config_aerial, scenario = scenario))
+            else:
+                fit.append(calc_fitness(ind, genome, config_ground, config_aerial, scenario = scenario))
+        results.append(fit)
+    return np.array(results)
+
+# simulate each (ground genome, aerial genome) pair in the list num_evals times, returns array (pairs, num_evals) with the results
+def simulate_pairs(pairs, config_ground, config_aerial, num_evals):
+    if len(pairs) == 0:
+        return np.zeros((0, num_evals))
+    if num_workers > 1:
+        return np.array(get_parallel_evaluator().run_jobs(pairs, None, config_ground, config_aerial, 2, num_evals))
+    grounds = [ground for ground, aerial in pairs for i in range(0,num_evals)]
+    aerials = [aerial for ground, aerial in pairs for i in range(0,num_evals)]
+    if batch_simulation:
+        return calc_fitness_batch(grounds, aerials, config_ground, config_aerial).reshape(len(pairs), num_evals)
+    fit = [calc_fitness(ground, aerial, config_ground, config_aerial) for ground, aerial in zip(grounds, aerials)]
+    return np.array(fit).reshape(len(pairs), num_evals)
+
+# return the evaluator running genome x repeat simulations in num_workers processes, it is started on first use
+# with the concurrent update scheme each population type gets its own worker processes
+def get_parallel_evaluator(type = 0):
+    pool = type if update_scheme == "concurrent" else 0
+    if pool not in parallel_evaluators:
+        parallel_evaluators[pool] = neat.CoevolutionParallelEvaluator(num_workers, calc_fitness, num_simulations(num_evals_per_pair), verbose = True, context_function = prune_worker_caches)
+    return parallel_evaluators[pool]
+
+# called in each worker process of a parallel evaluator when a new evaluation starts: the workers do not know the
+# populations, so the networks of genomes that were not simulated in the previous evaluation are dropped
+def prune_worker_caches():
+    phenotype_cache_ground.prune_unused()
+    phenotype_cache_aerial.prune_unused()
+
+# return network of a genome (a CompiledFeedForwardNetwork if compiled_networks)
+def create_net(genome, config):
+    if compiled_networks:
+        return neat.nn.CompiledFeedForwardNetwork.create(genome, config)
+    return neat.nn.FeedForwardNetwork.create(genome, config)
+
+# return network of a ground robot genome (see Ground_Robot.create_net)
+def create_ground_net(genome, config):
+    if compiled_ground_controller:
+        return Compiled_Controller(create_net(genome, config))
+    return create_net(genome, config)
+
+# stop the worker processes of all parallel evaluators
+def stop_parallel_evaluators():
+    for evaluator in parallel_evaluators.values():
+        evaluator.stop()
+    parallel_evaluators.clear()
+
+# return genome class of both populations
+def genome_type():
+    return neat.ArrayGenome if array_genomes else neat.DefaultGenome
+
+# set run_type and the scenario it stands for: "fi"/"ri" = fixed/random initial poses,
+# "ft"/"rt" = fixed/random token, "c"/"o" = closed (bounded)/open map, e.g. "riftc"
+def set_run_type(name):
+    global run_type, rand_init, rand_token, map_bounded
+    if len(name) != 5 or name[0:2] not in ("fi", "ri") or name[2:4] not in ("ft", "rt") or name[4] not in ("c", "o"):
+        raise RuntimeError("Unexpected run_type: {0!r}".format(name))
+    run_type = name
+    rand_init = name[0:2] == "ri"
+    rand_token = name[2:4] == "rt"
+    map_bounded = name[4] == "c"
+
+# return description of the scenario used to identify cached fitness values,
+# None if the simulation results are random and can not be reused
+def scenario_key():
+    if not is_deterministic(rand_init, rand_token):
+        return None
+    return (map_x, map_y, map_bounded, token_per_area, num_time_steps)
+
+# return key of the fitness cache for a genome evaluated together with ind (given by their fingerprints)
+def pair_key(genome_fingerprint, ind_fingerprint, type, scenario):
+    if type == 0:
+        return FitnessCache.key(genome_fingerprint, ind_fingerprint, scenario)
+    return FitnessCache.key(ind_fingerprint, genome_fingerprint, scenario)
+
+# return ScenarioBank with the num_evals scenarios shared by all genomes of a population evaluation,
+# None if the scenario bank is not used or the scenario is not random
+def draw_scenario_bank(num_evals):
+    if not use_scenario_bank or is_deterministic(rand_init, rand_token):
+        return None
+    return ScenarioBank(num_evals, (map_x,map_y), rand_init, rand_token, token_per_area)
+
+# return how many simulations are needed to evaluate a pair num_evals times
+# a deterministic scenario gives the same result in each repeat, so it is simulated only once
+def num_simulations(num_evals):
+    if is_deterministic(rand_init, rand_token):
+        return 1
+    return num_evals
+
+# calculate fitness of many pairs of robots, returns array with fitness of each pair
+# scenarios: list with the Scenario of each pair, None = draw them
+def calc_fitness_batch(genomes_ground_robot, genomes_aerial_robot, config_ground, config_aerial, scenarios = None):
+    nets_ground, nets_aerial = None, None
+    if use_phenotype_cache:
+        nets_ground = phenotype_cache_ground.get_all(genomes_ground_robot, config_ground)
+        nets_aerial = phenotype_cache_aerial.get_all(genomes_aerial_robot, config_aerial)
+    simulator = BatchSimulator(genomes_ground_robot, genomes_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = rand_init, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area, compiled_controller = compiled_ground_controller, batched_networks = batched_networks, nets_ground = nets_ground, nets_aerial = nets_aerial, scenarios = scenarios)
+    return simulator.run(num_time_steps)
 
 # calculate fitness of two robots
-def calc_fitness(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, print_behaviour = False):
+# scenario: Scenario to simulate (e.g. from a ScenarioBank), None = draw it
+def calc_fitness(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, print_behaviour = False, scenario = None):
+    net_ground, net_aerial = None, None
+    if use_phenotype_cache:
+        net_ground = phenotype_cache_ground.get(genome_ground_robot, config_ground)
+        net_aerial = phenotype_cache_aerial.get(genome_aerial_robot, config_aerial)
     #generate simulator
-    simulator = Simulator(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = rand_init, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area)
+    simulator = Simulator(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = rand_init, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area, compiled_controller = compiled_ground_controller, net_ground = net_ground, net_aerial = net_aerial, token_grid = use_token_grid, fast_forward = fast_forward_ground, collect_metrics = collect_metrics or print_behaviour, num_steps = num_time_steps, scenario = scenario)
     # run simulation
     for i in range(num_time_steps):
         f = simulator.step()
@@ -60,20 +293,46 @@ def calc_fitness(genome_ground_robot, genome_aerial_robot, config_ground, config
             break
     return simulator.ground_robot.collected_token
 
+# return the settings that a run resumed from a checkpoint must share with the run that saved it
+def run_settings():
+    return {'run_type': run_type, 'rand_init': rand_init, 'rand_token': rand_token, 'map_bounded': map_bounded,
+            'map_size': (map_x, map_y), 'token_per_area': token_per_area, 'num_time_steps': num_time_steps,
+            'num_evals_per_pair': num_evals_per_pair, 'update_scheme': update_scheme, 'racing': racing,
+            'use_scenario_bank': use_scenario_bank, 'genome_type': genome_type().__name__}
+
 # create population and run the evolution
 def run(config_ground, config_aerial,index):
 
-    # Create the population, which is the top-level object for a NEAT run.
-    p = neat.Population(config_ground, config_aerial)
+    # Create the population, which is the top-level object for a NEAT run,
+    # or restore it from the latest checkpoint of this run
+    checkpoint_prefix = '../Results/checkpoint_'+str(run_type)+'_'+ str(index)+'_'
+    checkpoint = None
+    if resume_from_checkpoint:
+        checkpoint = neat.CoevolutionCheckpointer.latest_checkpoint(checkpoint_prefix)
+    if checkpoint is None:
+        p = neat.Population(config_ground, config_aerial)
+    else:
+        print("Resume from checkpoint "+checkpoint)
+        p = neat.CoevolutionCheckpointer.restore_checkpoint(checkpoint, config_ground, config_aerial, run_settings())
+    checkpointer = None
+    if checkpoint_interval is not None:
+        checkpointer = neat.CoevolutionCheckpointer(checkpoint_interval, filename_prefix=checkpoint_prefix, run_description=run_settings())
 
     # Add a stdout reporter to show progress in the terminal.
     p.add_reporter(neat.StdOutReporter(True))
 
-    # Run for up to max_num_gen generations.
+    # log of the best pair and fitness statistics of each generation (two records per generation), see generation_log.py
+    generation_log = None
+    if use_generation_log:
+        generation_log = GenerationLog('../Results/results_log_'+str(run_type)+'_'+ str(index), None if checkpoint is None else 2*p.generation_ground)
+
+    # Run until max_num_gen generations are completed.
     # winner_g, winner_a: best ground and aerial genomes over all generations
-    # best_pair: best pair of each generation
+    # best_pair: best pair of each generation (read from the generation log if it is used)
     # ma, mi, av: max, min, average fitness over all generations
-    winner_g, winner_a, best_pair, ma, mi, av = p.run(eval_genomes, max_num_gen)
+    winner_g, winner_a, best_pair, ma, mi, av = p.run(eval_genomes, max_num_gen - p.generation_ground, update_scheme, generation_log, checkpointer)
+    if generation_log is not None:
+        generation_log.close()
 
     # evaluate best pairs best_of_evaluation times
     # max_fitn, avg_fitn, min_fitn: max, min, average fitness of best pair evaluations per generation
@@ -92,11 +351,12 @@ def run(config_ground, config_aerial,index):
     # TODO: clean up
     # save best, worst, average fitness of each generation , best pair of average fitness,
     # avg_fitn: list of average fitnesses per generation after final evaluation
+    # update_scheme: how the populations were evaluated ("sequential" or "concurrent")
     name = '../Results/results_'+str(run_type)+'_'+ str(index)+'.npz'
-    np.savez(name, ma, mi, av,[best_avg_pair[0]],[best_avg_pair[1]],avg_fitn)
-    # save list of best pairs for each generation
-    name = '../Results/results_best_'+str(run_type)+'_'+ str(index)+'.npz'
-    np.savez(name, best_pair)
+    np.savez(name, ma, mi, av,[best_avg_pair[0]],[best_avg_pair[1]],avg_fitn,[update_scheme])
+    # save list of best pairs for each generation as genome archive (see genome_archive.py)
+    name = '../Results/results_best_'+str(run_type)+'_'+ str(index)+'.gar'
+    save_genomes(name, [list(best_pair)])
 
     # save full population of last generation
     gg = []
@@ -105,36 +365,16 @@ def run(config_ground, config_aerial,index):
     aa = []
     for a in itervalues(p.population_aerial):
         aa.append(a)
-    gg = np.array(gg, dtype="object")
-    aa = np.array(aa, dtype="object")
-    name = '../Results/results_full_pop_'+str(run_type)+'_'+ str(index)+'.npz'
-    np.savez(name, [best_avg_pair[0]],[best_avg_pair[1]],gg,aa)
+    name = '../Results/results_full_pop_'+str(run_type)+'_'+ str(index)+'.gar'
+    save_genomes(name, [[best_avg_pair[0]],[best_avg_pair[1]],gg,aa])
 
     print("Test "+str(run_type)+'_'+ str(index))
 
 
-# evaluate best pairs of each evaluation
+# evaluate best pairs of each evaluation, every distinct pair is simulated once (see pair_evaluation.py)
 def evaluate_best_pairs(best_pair, config_ground, config_aerial):
-    max_fitn = []
-    avg_fitn = []
-    min_fitn = []
-    best_avg_pair = []
-    for r in range(0,len(best_pair)):
-        if (r % 5 == 0):
-            print(r)
-        ground = best_pair[r][0]
-        aerial = best_pair[r][1]
-        temp_fitn = []
-        for i in range(0,best_of_evaluation):
-            temp_fitn.append(calc_fitness(ground, aerial, config_ground, config_aerial, print_behaviour= False))
-
-        max_fitn.append(np.amax(temp_fitn))
-        avg_fitn.append(np.average(temp_fitn))
-        min_fitn.append(np.amin(temp_fitn))
-        if np.amax(avg_fitn) == avg_fitn[-1]:
-            best_avg_pair=best_pair[r]
-
-    return max_fitn, avg_fitn, min_fitn, best_avg_pair
+    simulate = lambda pairs, num_evals: simulate_pairs(pairs, config_ground, config_aerial, num_evals)
+    return evaluate_pairs(best_pair, simulate, num_simulations(best_of_evaluation))
 
 if __name__ == '__main__':
     starting_time= time.time()
@@ -146,10 +386,10 @@ if __name__ == '__main__':
     config_path_aerial = os.path.join(local_dir, 'config-aerial')
 
     # Load configuration.
-    config_ground = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+    config_ground = neat.Config(genome_type(), neat.DefaultReproduction,
                          neat.DefaultSpeciesSet, neat.DefaultStagnation,
                          config_path_ground)
-    config_aerial = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+    config_aerial = neat.Config(genome_type(), neat.DefaultReproduction,
                       neat.DefaultSpeciesSet, neat.DefaultStagnation,
                       config_path_aerial)
 
@@ -161,5 +401,6 @@ if __name__ == '__main__':
         print('Time elapsed in seconds: {:1.1f}, and in minutes: {:1.1f}'.format(now, now/60))
         print('Run number '+ str(i) + ' from '+ str(amount_of_runs)+ ' runs overall.')
 
+    stop_parallel_evaluators()
     now = time.time() - starting_time
     print('Time elapsed in seconds: {:1.1f}, and in minutes: {:1.1f}'.format(now, now/60))
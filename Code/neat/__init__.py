@@ -7,12 +7,13 @@ import neat.distributed as distributed
 from neat.config import Config
 from neat.population import Population, CompleteExtinctionException
 from neat.genome import DefaultGenome
+from neat.array_genome import ArrayGenome
 from neat.reproduction import DefaultReproduction
 from neat.stagnation import DefaultStagnation
 from neat.reporting import StdOutReporter
 from neat.species import DefaultSpeciesSet
 from neat.statistics import StatisticsReporter
-from neat.parallel import ParallelEvaluator
+from neat.parallel import ParallelEvaluator, CoevolutionParallelEvaluator
 from neat.distributed import DistributedEvaluator, host_is_local
 from neat.threaded import ThreadedEvaluator
-from neat.checkpoint import Checkpointer
+from neat.checkpoint import Checkpointer, CoevolutionCheckpointer
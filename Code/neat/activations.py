@@ -7,6 +7,8 @@ from __future__ import division
 import math
 import types
 
+import numpy as np
+
 
 def sigmoid_activation(z):
     z = max(-60.0, min(60.0, 5.0 * z))
@@ -80,6 +82,37 @@ def cube_activation(z):
     return z ** 3
 
 
+# NumPy versions of the built-in activation functions, applied element-wise to arrays.
+# They are keyed by the scalar function they replace.
+vectorized_activations = {
+    sigmoid_activation: lambda z: 1.0 / (1.0 + np.exp(-np.maximum(-60.0, np.minimum(60.0, 5.0 * z)))),
+    tanh_activation: lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    sin_activation: lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    gauss_activation: lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4)**2),
+    relu_activation: lambda z: np.where(z > 0.0, z, 0.0),
+    softplus_activation: lambda z: 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    identity_activation: lambda z: z,
+    clamped_activation: lambda z: np.clip(z, -1.0, 1.0),
+    log_activation: lambda z: np.log(np.maximum(1e-7, z)),
+    exp_activation: lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    abs_activation: np.abs,
+    hat_activation: lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    square_activation: lambda z: z ** 2,
+    cube_activation: lambda z: z ** 3,
+}
+
+
+def vectorize_activation(function):
+    """
+    Returns a function applying the activation function element-wise to an array,
+    using the NumPy version for built-in functions.
+    """
+    f = vectorized_activations.get(function)
+    if f is None:
+        f = np.vectorize(function, otypes=[float])
+    return f
+
+
 class InvalidActivationFunction(TypeError):
     pass
 
@@ -0,0 +1,489 @@
+"""Genome with its genes stored in sorted NumPy arrays instead of dicts of gene objects."""
+from __future__ import division
+
+import hashlib
+from random import choice, random, randrange
+from types import MappingProxyType
+
+import numpy as np
+
+from neat.genes import DefaultConnectionGene, DefaultNodeGene
+from neat.genome import DefaultGenome, DefaultGenomeConfig
+from neat.graphs import creates_cycle
+
+
+def connection_codes(inputs, outputs):
+    """
+    Encodes connection keys (input, output) as int64 codes input * 2**32 + output. Outputs are
+    never negative, so the codes sort like the key tuples.
+    """
+    return np.asarray(inputs, dtype=np.int64) * (2**32) + np.asarray(outputs, dtype=np.int64)
+
+
+def connection_keys(codes):
+    """Returns the input and output keys of connection codes as two int64 arrays."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return codes // (2**32), codes % (2**32)
+
+
+def init_float_values(config, name, n):
+    """Returns n initial values of the float attribute `name` (as FloatAttribute.init_value)."""
+    mean = getattr(config, name + '_init_mean')
+    stdev = getattr(config, name + '_init_stdev')
+    min_value = getattr(config, name + '_min_value')
+    max_value = getattr(config, name + '_max_value')
+    init_type = getattr(config, name + '_init_type').lower()
+
+    if ('gauss' in init_type) or ('normal' in init_type):
+        return np.clip(np.random.normal(mean, stdev, n), min_value, max_value)
+
+    if 'uniform' in init_type:
+        return np.random.uniform(max(min_value, mean - 2 * stdev), min(max_value, mean + 2 * stdev), n)
+
+    raise RuntimeError("Unknown init_type {!r} for {!s}".format(getattr(config, name + '_init_type'),
+                                                                name + '_init_type'))
+
+
+def mutate_float_values(values, config, name):
+    """
+    Mutates the float attribute `name` of all genes in place, with the probabilities of
+    FloatAttribute.mutate_value: perturbed with mutate_rate, replaced with replace_rate.
+    """
+    mutate_rate = getattr(config, name + '_mutate_rate')
+    replace_rate = getattr(config, name + '_replace_rate')
+    r = np.random.random(len(values))
+    mutate = r < mutate_rate
+    replace = ~mutate & (r < replace_rate + mutate_rate)
+    if mutate.any():
+        perturbed = values[mutate] + np.random.normal(0.0, getattr(config, name + '_mutate_power'), mutate.sum())
+        values[mutate] = np.clip(perturbed, getattr(config, name + '_min_value'), getattr(config, name + '_max_value'))
+    if replace.any():
+        values[replace] = init_float_values(config, name, replace.sum())
+
+
+def init_bool_values(config, name, n):
+    """Returns n initial values of the bool attribute `name` (as BoolAttribute.init_value)."""
+    default = str(getattr(config, name + '_default')).lower()
+
+    if default in ('1', 'on', 'yes', 'true'):
+        return np.ones(n, dtype=bool)
+    elif default in ('0', 'off', 'no', 'false'):
+        return np.zeros(n, dtype=bool)
+    elif default in ('random', 'none'):
+        return np.random.random(n) < 0.5
+
+    raise RuntimeError("Unknown default value {!r} for {!s}".format(default, name))
+
+
+def mutate_bool_values(values, config, name):
+    """Mutates the bool attribute `name` of all genes in place (as BoolAttribute.mutate_value)."""
+    mutate_rate = np.where(values,
+                           getattr(config, name + '_mutate_rate') + getattr(config, name + '_rate_to_false_add'),
+                           getattr(config, name + '_mutate_rate') + getattr(config, name + '_rate_to_true_add'))
+    if not (mutate_rate > 0).any():
+        return
+    # As for BoolAttribute, a mutated value is drawn at random and may stay the same.
+    mutate = np.random.random(len(values)) < mutate_rate
+    values[mutate] = np.random.random(mutate.sum()) < 0.5
+
+
+def init_string_values(config, name, n):
+    """Returns n initial values of the string attribute `name` as object array."""
+    default = getattr(config, name + '_default')
+    values = np.empty(n, dtype=object)
+    if default.lower() in ('none', 'random'):
+        options = getattr(config, name + '_options')
+        values[:] = [options[i] for i in np.random.randint(len(options), size=n)]
+    else:
+        values[:] = default
+    return values
+
+
+def mutate_string_values(values, config, name):
+    """Mutates the string attribute `name` of all genes in place (as StringAttribute.mutate_value)."""
+    mutate_rate = getattr(config, name + '_mutate_rate')
+    if mutate_rate <= 0:
+        return
+    mutate = np.flatnonzero(np.random.random(len(values)) < mutate_rate)
+    options = getattr(config, name + '_options')
+    for i, option in zip(mutate, np.random.randint(len(options), size=len(mutate))):
+        values[i] = options[option]
+
+
+def _crossover(homologous, values1, values2):
+    """Returns the attribute values of a child: homologous genes inherit from either parent at random."""
+    take2 = homologous & (np.random.random(len(homologous)) <= 0.5)
+    return np.where(take2, values2, values1)
+
+
+def _sequential_sum(values):
+    """Returns the sum of the values added one by one (like a Python loop, unlike numpy.sum)."""
+    return np.cumsum(values)[-1] if len(values) > 0 else 0.0
+
+
+class ArrayGenome(object):
+    """
+    A genome for feed-forward and recurrent networks with the genes of DefaultGenome, stored as
+    NumPy arrays sorted by gene key:
+        node_keys, node_bias, node_response, node_activation, node_aggregation
+        conn_keys (codes of the (input, output) keys, see connection_codes), conn_weight, conn_enabled
+    Crossover, mutation and distance work on whole arrays, and a genome needs a fraction of the
+    memory of the gene objects of a DefaultGenome.
+
+    It reads the [DefaultGenome] section of the configuration file and follows the same rules
+    (see DefaultGenome), attribute mutation uses numpy.random with the probabilities of the gene
+    attributes. `nodes` and `connections` are read-only dicts of DefaultNodeGene and
+    DefaultConnectionGene objects for code written for DefaultGenome (networks, genome archive);
+    changes to these genes are not stored in the genome.
+    """
+    config_section = 'DefaultGenome'
+
+    @classmethod
+    def parse_config(cls, param_dict):
+        param_dict['node_gene_type'] = DefaultNodeGene
+        param_dict['connection_gene_type'] = DefaultConnectionGene
+        return DefaultGenomeConfig(param_dict)
+
+    @classmethod
+    def write_config(cls, f, config):
+        config.save(f)
+
+    def __init__(self, key):
+        # Unique identifier for a genome instance.
+        self.key = key
+
+        self.node_keys = np.zeros(0, dtype=np.int64)
+        self.node_bias = np.zeros(0)
+        self.node_response = np.zeros(0)
+        self.node_activation = np.empty(0, dtype=object)
+        self.node_aggregation = np.empty(0, dtype=object)
+        self.conn_keys = np.zeros(0, dtype=np.int64)
+        self.conn_weight = np.zeros(0)
+        self.conn_enabled = np.zeros(0, dtype=bool)
+
+        # Fitness results.
+        self.fitness = None
+
+        # Incremented whenever the genes are changed, so that cached phenotypes can be invalidated.
+        self.version = 0
+        self._gene_views = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_gene_views'] = None
+        return state
+
+    @classmethod
+    def from_genome(cls, genome):
+        """Returns an ArrayGenome with the key, fitness and genes of a DefaultGenome."""
+        new = cls(genome.key)
+        new.fitness = genome.fitness
+        new._set_genes(genome.nodes, genome.connections)
+        return new
+
+    def _set_genes(self, nodes, connections):
+        keys = sorted(nodes)
+        self.node_keys = np.array(keys, dtype=np.int64)
+        self.node_bias = np.array([nodes[k].bias for k in keys], dtype=float)
+        self.node_response = np.array([nodes[k].response for k in keys], dtype=float)
+        self.node_activation = np.empty(len(keys), dtype=object)
+        self.node_activation[:] = [nodes[k].activation for k in keys]
+        self.node_aggregation = np.empty(len(keys), dtype=object)
+        self.node_aggregation[:] = [nodes[k].aggregation for k in keys]
+
+        keys = sorted(connections)
+        self.conn_keys = connection_codes([i for i, o in keys], [o for i, o in keys])
+        self.conn_weight = np.array([connections[k].weight for k in keys], dtype=float)
+        self.conn_enabled = np.array([connections[k].enabled for k in keys], dtype=bool)
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._gene_views = None
+
+    def _views(self):
+        if self._gene_views is None:
+            nodes = {}
+            for k, bias, response, activation, aggregation in zip(
+                    self.node_keys.tolist(), self.node_bias.tolist(), self.node_response.tolist(),
+                    self.node_activation, self.node_aggregation):
+                node = DefaultNodeGene(k)
+                node.bias = bias
+                node.response = response
+                node.activation = activation
+                node.aggregation = aggregation
+                nodes[k] = node
+            connections = {}
+            inputs, outputs = connection_keys(self.conn_keys)
+            for i, o, weight, enabled in zip(inputs.tolist(), outputs.tolist(),
+                                             self.conn_weight.tolist(), self.conn_enabled.tolist()):
+                conn = DefaultConnectionGene((i, o))
+                conn.weight = weight
+                conn.enabled = enabled
+                connections[(i, o)] = conn
+            self._gene_views = (MappingProxyType(nodes), MappingProxyType(connections))
+        return self._gene_views
+
+    @property
+    def nodes(self):
+        return self._views()[0]
+
+    @property
+    def connections(self):
+        return self._views()[1]
+
+    def configure_new(self, config):
+        """Configure a new genome based on the given configuration."""
+        # The initial topologies are built by DefaultGenome, which handles all connectivity types.
+        genome = DefaultGenome(self.key)
+        genome.configure_new(config)
+        self._set_genes(genome.nodes, genome.connections)
+
+    def configure_crossover(self, genome1, genome2, config):
+        """ Configure a new genome by crossover from two parent genomes. """
+        assert isinstance(genome1.fitness, (int, float))
+        assert isinstance(genome2.fitness, (int, float))
+        if genome1.fitness > genome2.fitness:
+            parent1, parent2 = genome1, genome2
+        else:
+            parent1, parent2 = genome2, genome1
+
+        # Genes of the fittest parent are inherited, homologous genes combine both parents.
+        index, homologous = self._match(parent1.conn_keys, parent2.conn_keys)
+        self.conn_keys = parent1.conn_keys.copy()
+        self.conn_weight = _crossover(homologous, parent1.conn_weight, parent2.conn_weight[index])
+        self.conn_enabled = _crossover(homologous, parent1.conn_enabled, parent2.conn_enabled[index])
+
+        index, homologous = self._match(parent1.node_keys, parent2.node_keys)
+        self.node_keys = parent1.node_keys.copy()
+        self.node_bias = _crossover(homologous, parent1.node_bias, parent2.node_bias[index])
+        self.node_response = _crossover(homologous, parent1.node_response, parent2.node_response[index])
+        self.node_activation = _crossover(homologous, parent1.node_activation, parent2.node_activation[index])
+        self.node_aggregation = _crossover(homologous, parent1.node_aggregation, parent2.node_aggregation[index])
+        self._changed()
+
+    @staticmethod
+    def _match(keys1, keys2):
+        """
+        Returns for each key of the sorted array keys1 its index in the sorted array keys2
+        (clipped to a valid index if it is missing, or 0 if keys2 is empty) and whether it is in keys2.
+        """
+        if len(keys2) == 0:
+            return np.zeros(len(keys1), dtype=int), np.zeros(len(keys1), dtype=bool)
+        index = np.minimum(np.searchsorted(keys2, keys1), len(keys2) - 1)
+        return index, keys2[index] == keys1
+
+    def mutate(self, config):
+        """ Mutates this genome. """
+        self.mutate_structure(config)
+
+        # Mutate connection genes.
+        mutate_float_values(self.conn_weight, config, 'weight')
+        mutate_bool_values(self.conn_enabled, config, 'enabled')
+
+        # Mutate node genes (bias, response, etc.).
+        mutate_float_values(self.node_bias, config, 'bias')
+        mutate_float_values(self.node_response, config, 'response')
+        mutate_string_values(self.node_activation, config, 'activation')
+        mutate_string_values(self.node_aggregation, config, 'aggregation')
+        self._changed()
+
+    def mutate_structure(self, config):
+        """ Applies the structural mutations of mutate (adding or deleting nodes and connections). """
+        if config.single_structural_mutation:
+            div = max(1, (config.node_add_prob + config.node_delete_prob +
+                          config.conn_add_prob + config.conn_delete_prob))
+            r = random()
+            if r < (config.node_add_prob/div):
+                self.mutate_add_node(config)
+            elif r < ((config.node_add_prob + config.node_delete_prob)/div):
+                self.mutate_delete_node(config)
+            elif r < ((config.node_add_prob + config.node_delete_prob +
+                       config.conn_add_prob)/div):
+                self.mutate_add_connection(config)
+            elif r < ((config.node_add_prob + config.node_delete_prob +
+                       config.conn_add_prob + config.conn_delete_prob)/div):
+                self.mutate_delete_connection()
+        else:
+            if random() < config.node_add_prob:
+                self.mutate_add_node(config)
+
+            if random() < config.node_delete_prob:
+                self.mutate_delete_node(config)
+
+            if random() < config.conn_add_prob:
+                self.mutate_add_connection(config)
+
+            if random() < config.conn_delete_prob:
+                self.mutate_delete_connection()
+
+    def add_node(self, config, node_key):
+        """Adds a node gene with initial attribute values."""
+        i = np.searchsorted(self.node_keys, node_key)
+        assert i == len(self.node_keys) or self.node_keys[i] != node_key
+        self.node_keys = np.insert(self.node_keys, i, node_key)
+        self.node_bias = np.insert(self.node_bias, i, init_float_values(config, 'bias', 1))
+        self.node_response = np.insert(self.node_response, i, init_float_values(config, 'response', 1))
+        self.node_activation = np.insert(self.node_activation, i, init_string_values(config, 'activation', 1))
+        self.node_aggregation = np.insert(self.node_aggregation, i, init_string_values(config, 'aggregation', 1))
+        self._changed()
+
+    def add_connection(self, config, input_key, output_key, weight=None, enabled=None):
+        """Adds a connection gene, attributes that are None get their initial values."""
+        assert output_key >= 0
+        code = connection_codes(input_key, output_key)
+        i = np.searchsorted(self.conn_keys, code)
+        assert i == len(self.conn_keys) or self.conn_keys[i] != code
+        if weight is None:
+            weight = init_float_values(config, 'weight', 1)[0]
+        if enabled is None:
+            enabled = init_bool_values(config, 'enabled', 1)[0]
+        self.conn_keys = np.insert(self.conn_keys, i, code)
+        self.conn_weight = np.insert(self.conn_weight, i, weight)
+        self.conn_enabled = np.insert(self.conn_enabled, i, enabled)
+        self._changed()
+
+    def mutate_add_node(self, config):
+        if len(self.conn_keys) == 0:
+            if config.check_structural_mutation_surer():
+                self.mutate_add_connection(config)
+            return
+
+        # Choose a random connection to split
+        split = randrange(len(self.conn_keys))
+        new_node_id = config.get_new_node_key(dict.fromkeys(self.node_keys.tolist()))
+        self.add_node(config, new_node_id)
+
+        # Disable this connection and create two new connections joining its nodes via
+        # the given node.  The new node+connections have roughly the same behavior as
+        # the original connection (depending on the activation function of the new node).
+        self.conn_enabled[split] = False
+        weight = self.conn_weight[split]
+        i, o = connection_keys(self.conn_keys[split])
+        self.add_connection(config, int(i), new_node_id, 1.0, True)
+        self.add_connection(config, new_node_id, int(o), weight, True)
+
+    def mutate_add_connection(self, config):
+        """
+        Attempt to add a new connection, the only restriction being that the output
+        node cannot be one of the network input pins.
+        """
+        possible_outputs = self.node_keys.tolist()
+        out_node = choice(possible_outputs)
+
+        possible_inputs = possible_outputs + config.input_keys
+        in_node = choice(possible_inputs)
+
+        # Don't duplicate connections.
+        code = connection_codes(in_node, out_node)
+        i = np.searchsorted(self.conn_keys, code)
+        if i < len(self.conn_keys) and self.conn_keys[i] == code:
+            if config.check_structural_mutation_surer():
+                self.conn_enabled[i] = True
+                self._changed()
+            return
+
+        # Don't allow connections between two output nodes
+        if in_node in config.output_keys and out_node in config.output_keys:
+            return
+
+        # For feed-forward networks, avoid creating cycles.
+        if config.feed_forward:
+            inputs, outputs = connection_keys(self.conn_keys)
+            if creates_cycle(list(zip(inputs.tolist(), outputs.tolist())), (in_node, out_node)):
+                return
+
+        self.add_connection(config, in_node, out_node)
+
+    def mutate_delete_node(self, config):
+        # Do nothing if there are no non-output nodes.
+        available_nodes = [k for k in self.node_keys.tolist() if k not in config.output_keys]
+        if not available_nodes:
+            return -1
+
+        del_key = choice(available_nodes)
+
+        inputs, outputs = connection_keys(self.conn_keys)
+        keep = (inputs != del_key) & (outputs != del_key)
+        self.conn_keys = self.conn_keys[keep]
+        self.conn_weight = self.conn_weight[keep]
+        self.conn_enabled = self.conn_enabled[keep]
+
+        keep = self.node_keys != del_key
+        self.node_keys = self.node_keys[keep]
+        self.node_bias = self.node_bias[keep]
+        self.node_response = self.node_response[keep]
+        self.node_activation = self.node_activation[keep]
+        self.node_aggregation = self.node_aggregation[keep]
+        self._changed()
+
+        return del_key
+
+    def mutate_delete_connection(self):
+        if len(self.conn_keys) > 0:
+            i = randrange(len(self.conn_keys))
+            self.conn_keys = np.delete(self.conn_keys, i)
+            self.conn_weight = np.delete(self.conn_weight, i)
+            self.conn_enabled = np.delete(self.conn_enabled, i)
+            self._changed()
+
+    def distance(self, other, config):
+        """
+        Returns the genetic distance between this genome and the other (as DefaultGenome.distance,
+        the gene distances are added one by one in the order of the keys).
+        """
+        # Compute node gene distance component.
+        node_distance = 0.0
+        num_nodes = max(len(self.node_keys), len(other.node_keys))
+        if num_nodes > 0:
+            index, homologous = self._match(self.node_keys, other.node_keys)
+            disjoint_nodes = len(self.node_keys) + len(other.node_keys) - 2 * homologous.sum()
+            index = index[homologous]
+            d = (np.abs(self.node_bias[homologous] - other.node_bias[index]) +
+                 np.abs(self.node_response[homologous] - other.node_response[index]) +
+                 (self.node_activation[homologous] != other.node_activation[index]) +
+                 (self.node_aggregation[homologous] != other.node_aggregation[index]))
+            node_distance = (_sequential_sum(d * config.compatibility_weight_coefficient) +
+                             config.compatibility_disjoint_coefficient * disjoint_nodes) / num_nodes
+
+        # Compute connection gene differences.
+        connection_distance = 0.0
+        num_connections = max(len(self.conn_keys), len(other.conn_keys))
+        if num_connections > 0:
+            index, homologous = self._match(self.conn_keys, other.conn_keys)
+            disjoint_connections = len(self.conn_keys) + len(other.conn_keys) - 2 * homologous.sum()
+            index = index[homologous]
+            d = (np.abs(self.conn_weight[homologous] - other.conn_weight[index]) +
+                 (self.conn_enabled[homologous] != other.conn_enabled[index]))
+            connection_distance = (_sequential_sum(d * config.compatibility_weight_coefficient) +
+                                   config.compatibility_disjoint_coefficient * disjoint_connections) / num_connections
+
+        return float(node_distance + connection_distance)
+
+    def fingerprint(self):
+        """
+        Returns a hash of the genome's genes, equal to the fingerprint of a DefaultGenome
+        with the same genes.
+        """
+        inputs, outputs = connection_keys(self.conn_keys)
+        values = [list(zip(self.node_keys.tolist(), self.node_bias.tolist(), self.node_response.tolist(),
+                           self.node_activation.tolist(), self.node_aggregation.tolist())),
+                  list(zip(zip(inputs.tolist(), outputs.tolist()), self.conn_weight.tolist(),
+                           self.conn_enabled.tolist()))]
+        return hashlib.sha1(repr(values).encode()).hexdigest()
+
+    def size(self):
+        """
+        Returns genome 'complexity', taken to be
+        (number of nodes, number of enabled connections)
+        """
+        return len(self.node_keys), int(self.conn_enabled.sum())
+
+    def __str__(self):
+        s = "Key: {0}\nFitness: {1}\nNodes:".format(self.key, self.fitness)
+        for k, ng in self.nodes.items():
+            s += "\n\t{0} {1!s}".format(k, ng)
+        s += "\nConnections:"
+        for c in self.connections.values():
+            s += "\n\t" + str(c)
+        return s
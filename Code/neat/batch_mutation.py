@@ -0,0 +1,57 @@
+"""Mutation of the gene attributes of many genomes in vectorized passes."""
+from __future__ import division
+
+import numpy as np
+
+from neat.array_genome import mutate_bool_values, mutate_float_values, mutate_string_values
+from neat.genes import DefaultConnectionGene, DefaultNodeGene
+
+# (ArrayGenome array, genes of a DefaultGenome, attribute name, dtype, mutation of an array of values)
+_ATTRIBUTES = [('conn_weight', 'connections', 'weight', float, mutate_float_values),
+               ('conn_enabled', 'connections', 'enabled', bool, mutate_bool_values),
+               ('node_bias', 'nodes', 'bias', float, mutate_float_values),
+               ('node_response', 'nodes', 'response', float, mutate_float_values),
+               ('node_activation', 'nodes', 'activation', object, mutate_string_values),
+               ('node_aggregation', 'nodes', 'aggregation', object, mutate_string_values)]
+
+
+def supports(config):
+    """
+    Returns True if the genomes of the given config (DefaultGenome or ArrayGenome with the default
+    gene types) can be mutated with mutate_genomes.
+    """
+    genome_config = config.genome_config
+    return (hasattr(config.genome_type, 'mutate_structure') and
+            genome_config.node_gene_type is DefaultNodeGene and
+            genome_config.connection_gene_type is DefaultConnectionGene)
+
+
+def mutate_genomes(genomes, config):
+    """
+    Mutates the gene attributes of all genomes, the part of genome.mutate that follows
+    genome.mutate_structure. The values of each attribute of all genes are gathered into one array,
+    mutated with the per-gene probabilities of the attribute config (as FloatAttribute.mutate_value
+    etc., but drawn with NumPy) and written back.
+    """
+    array_genomes = [g for g in genomes if hasattr(g, 'node_keys')]
+    gene_genomes = [g for g in genomes if not hasattr(g, 'node_keys')]
+
+    for array_name, genes_name, name, dtype, mutate_values in _ATTRIBUTES:
+        # Values of the ArrayGenomes followed by the values of the genes of the other genomes.
+        parts = [getattr(g, array_name) for g in array_genomes]
+        genes = [gene for g in gene_genomes for gene in getattr(g, genes_name).values()]
+        other_values = np.empty(len(genes), dtype=dtype)
+        other_values[:] = [getattr(gene, name) for gene in genes]
+        values = np.concatenate(parts + [other_values])
+
+        mutate_values(values, config, name)
+
+        offset = 0
+        for g, part in zip(array_genomes, parts):
+            setattr(g, array_name, values[offset:offset+len(part)].copy())
+            offset += len(part)
+        for gene, value in zip(genes, values[offset:].tolist()):
+            setattr(gene, name, value)
+
+    for g in array_genomes:
+        g._changed() # pylint: disable=protected-access
@@ -1,10 +1,15 @@
 """Uses `pickle` to save and restore populations (and other aspects of the simulation state)."""
 from __future__ import print_function
 
+import glob
 import gzip
+import io
+import os
 import random
 import time
 
+import numpy as np
+
 try:
     import cPickle as pickle # pylint: disable=import-error
 except ImportError:
@@ -76,3 +81,104 @@ class Checkpointer(BaseReporter):
             generation, config, population, species_set, rndstate = pickle.load(f)
             random.setstate(rndstate)
             return Population(config, (population, species_set, generation))
+
+
+class CoevolutionCheckpointer(object):
+    """
+    Saves and restores the complete state of a two-population Population: both populations,
+    species sets, reproduction indexers, best partners, accumulated statistics and the states
+    of `random` and `numpy.random`. Pass it to Population.run as checkpointer.
+    """
+    def __init__(self, generation_interval=10, time_interval_seconds=None,
+                 filename_prefix='neat-checkpoint-', run_description=None):
+        """
+        Saves the state after a complete generation every ``generation_interval`` generations or
+        ``time_interval_seconds``, whichever happens first.
+
+        :param generation_interval: If not None, maximum number of generations between checkpoints
+        :type generation_interval: int or None
+        :param time_interval_seconds: If not None, maximum number of seconds between checkpoints
+        :type time_interval_seconds: float or None
+        :param str filename_prefix: Prefix for the filename (the end will be the number of completed generations)
+        :param run_description: Picklable value describing the run (e.g. its settings), stored in the
+            checkpoints together with both configs and checked by restore_checkpoint
+        """
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+        self.run_description = run_description
+
+        self.last_generation_checkpoint = None
+        self.last_time_checkpoint = time.time()
+
+    def end_generation(self, population):
+        generation = population.generation_ground
+        if self.last_generation_checkpoint is None:
+            self.last_generation_checkpoint = generation - 1
+
+        checkpoint_due = False
+        if self.time_interval_seconds is not None:
+            if time.time() - self.last_time_checkpoint >= self.time_interval_seconds:
+                checkpoint_due = True
+        if self.generation_interval is not None:
+            if generation - self.last_generation_checkpoint >= self.generation_interval:
+                checkpoint_due = True
+
+        if checkpoint_due:
+            self.save_checkpoint(population)
+            self.last_generation_checkpoint = generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, population):
+        """
+        Saves the current state. The file is written under a temporary name and renamed
+        afterwards, so an interrupted save does not leave a truncated checkpoint.
+        """
+        filename = '{0}{1}'.format(self.filename_prefix, population.generation_ground)
+        print("Saving checkpoint to {0}".format(filename))
+
+        with gzip.open(filename + '.tmp', 'w', compresslevel=5) as f:
+            run = {'config_ground': _config_text(population.config_ground),
+                   'config_aerial': _config_text(population.config_aerial),
+                   'run_description': self.run_description}
+            data = (population.get_state(), random.getstate(), np.random.get_state(), run)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + '.tmp', filename)
+
+    @staticmethod
+    def restore_checkpoint(filename, config_ground, config_aerial, run_description=None):
+        """
+        Returns a Population in the saved state and restores the random number generators.
+        Raises RuntimeError if the configs or the run description differ from those of the saved run.
+        """
+        with gzip.open(filename) as f:
+            data = pickle.load(f)
+        if len(data) != 4:
+            raise RuntimeError("Checkpoint {0} does not store the configs of its run".format(filename))
+        state, rndstate, np_rndstate, run = data
+        current = {'config_ground': _config_text(config_ground),
+                   'config_aerial': _config_text(config_aerial),
+                   'run_description': run_description}
+        for name in ('config_ground', 'config_aerial', 'run_description'):
+            if run[name] != current[name]:
+                raise RuntimeError("Checkpoint {0} was saved with a different {1}".format(filename, name))
+        random.setstate(rndstate)
+        np.random.set_state(np_rndstate)
+        return Population(config_ground, config_aerial, state)
+
+    @staticmethod
+    def latest_checkpoint(filename_prefix):
+        """Returns the filename of the checkpoint with the most generations, None if there is none."""
+        latest = None
+        for filename in glob.glob(glob.escape(filename_prefix) + '*'):
+            suffix = filename[len(filename_prefix):]
+            if suffix.isdigit() and (latest is None or int(suffix) > latest[0]):
+                latest = (int(suffix), filename)
+        return None if latest is None else latest[1]
+
+
+def _config_text(config):
+    """Returns the configuration in the config file format."""
+    f = io.StringIO()
+    config.write(f)
+    return f.getvalue()
@@ -184,8 +184,9 @@ class Config(object):
             raise UnknownConfigItemError(
                 "Unknown (section 'NEAT') configuration item {!s}".format(unknown_list[0]))
 
-        # Parse type sections.
-        genome_dict = dict(parameters.items(genome_type.__name__))
+        # Parse type sections. A genome type may read the section of another type with the
+        # same parameters (config_section).
+        genome_dict = dict(parameters.items(self.genome_section()))
         self.genome_config = genome_type.parse_config(genome_dict)
 
         species_set_dict = dict(parameters.items(species_set_type.__name__))
@@ -197,21 +198,28 @@ class Config(object):
         reproduction_dict = dict(parameters.items(reproduction_type.__name__))
         self.reproduction_config = reproduction_type.parse_config(reproduction_dict)
 
+    def genome_section(self):
+        return getattr(self.genome_type, 'config_section', self.genome_type.__name__)
+
     def save(self, filename):
         with open(filename, 'w') as f:
-            f.write('# The `NEAT` section specifies parameters particular to the NEAT algorithm\n')
-            f.write('# or the experiment itself.  This is the only required section.\n')
-            f.write('[NEAT]\n')
-            write_pretty_params(f, self, self.__params)
+            self.write(f)
+
+    def write(self, f):
+        """Writes the configuration in the config file format to the open text file f."""
+        f.write('# The `NEAT` section specifies parameters particular to the NEAT algorithm\n')
+        f.write('# or the experiment itself.  This is the only required section.\n')
+        f.write('[NEAT]\n')
+        write_pretty_params(f, self, self.__params)
 
-            f.write('\n[{0}]\n'.format(self.genome_type.__name__))
-            self.genome_type.write_config(f, self.genome_config)
+        f.write('\n[{0}]\n'.format(self.genome_section()))
+        self.genome_type.write_config(f, self.genome_config)
 
-            f.write('\n[{0}]\n'.format(self.species_set_type.__name__))
-            self.species_set_type.write_config(f, self.species_set_config)
+        f.write('\n[{0}]\n'.format(self.species_set_type.__name__))
+        self.species_set_type.write_config(f, self.species_set_config)
 
-            f.write('\n[{0}]\n'.format(self.stagnation_type.__name__))
-            self.stagnation_type.write_config(f, self.stagnation_config)
+        f.write('\n[{0}]\n'.format(self.stagnation_type.__name__))
+        self.stagnation_type.write_config(f, self.stagnation_config)
 
-            f.write('\n[{0}]\n'.format(self.reproduction_type.__name__))
-            self.reproduction_type.write_config(f, self.reproduction_config)
+        f.write('\n[{0}]\n'.format(self.reproduction_type.__name__))
+        self.reproduction_type.write_config(f, self.reproduction_config)
@@ -0,0 +1,154 @@
+"""Vectorized computation of the genetic distances between many genomes."""
+from __future__ import division
+
+import numpy as np
+
+from neat.genes import DefaultConnectionGene, DefaultNodeGene
+
+
+def gene_counts(genome):
+    """Returns the number of node genes and connection genes of a DefaultGenome or ArrayGenome."""
+    if hasattr(genome, 'node_keys'):
+        return len(genome.node_keys), len(genome.conn_keys)
+    return len(genome.nodes), len(genome.connections)
+
+
+class GenomeDistanceEngine(object):
+    """
+    Computes the genetic distances between many genomes (DefaultGenome or ArrayGenome with the
+    default gene types) in vectorized passes. The genes of each genome are read once and mapped to
+    columns of a shared gene key index, a distance matrix is then computed from the gene tables of
+    all genomes with NumPy.
+
+    Every value equals genome0.distance(genome1, config) exactly: the distances of the homologous
+    genes are added in the order in which genome0.distance visits them (np.cumsum adds sequentially).
+    """
+    def __init__(self, config):
+        self.config = config
+        self.node_columns = {}
+        self.connection_columns = {}
+        # Codes of the activation and aggregation function names.
+        self.names = {}
+        # id(genome) -> (genome, node genes, connection genes)
+        self.genes = {}
+
+    @staticmethod
+    def supports(config):
+        """Returns True if the genomes of the given genome config have the default gene types."""
+        return (config.node_gene_type is DefaultNodeGene and
+                config.connection_gene_type is DefaultConnectionGene)
+
+    def distances(self, genomes0, genomes1):
+        """Returns an array with genomes0[i].distance(genomes1[j], config) in row i, column j."""
+        if len(genomes0) == 0 or len(genomes1) == 0:
+            return np.zeros((len(genomes0), len(genomes1)))
+        genes0 = [self._genes(g) for g in genomes0]
+        genes1 = [self._genes(g) for g in genomes1]
+        node_distance = self._gene_distances([g[1] for g in genes0], [g[1] for g in genes1],
+                                             len(self.node_columns), self._node_terms)
+        connection_distance = self._gene_distances([g[2] for g in genes0], [g[2] for g in genes1],
+                                                   len(self.connection_columns), self._connection_terms)
+        return node_distance + connection_distance
+
+    def _genes(self, genome):
+        """
+        Returns (genome, node genes, connection genes) of a genome, the genes are tuples of arrays
+        (columns, attribute values...) in the order in which genome.distance visits them.
+        """
+        entry = self.genes.get(id(genome))
+        if entry is not None and entry[0] is genome:
+            return entry
+
+        if hasattr(genome, 'node_keys'):
+            # ArrayGenome: genes sorted by key.
+            node_keys = genome.node_keys.tolist()
+            node_values = (genome.node_bias, genome.node_response,
+                           [self._code(n) for n in genome.node_activation],
+                           [self._code(n) for n in genome.node_aggregation])
+            connection_keys = genome.conn_keys.tolist()
+            connection_values = (genome.conn_weight, genome.conn_enabled)
+        else:
+            node_keys = list(genome.nodes)
+            nodes = list(genome.nodes.values())
+            node_values = ([n.bias for n in nodes], [n.response for n in nodes],
+                           [self._code(n.activation) for n in nodes],
+                           [self._code(n.aggregation) for n in nodes])
+            connection_keys = list(genome.connections)
+            connections = list(genome.connections.values())
+            connection_values = ([c.weight for c in connections], [c.enabled for c in connections])
+
+        node_genes = (self._columns(self.node_columns, node_keys),
+                      np.array(node_values[0], dtype=float), np.array(node_values[1], dtype=float),
+                      np.array(node_values[2], dtype=int), np.array(node_values[3], dtype=int))
+        connection_genes = (self._columns(self.connection_columns, connection_keys),
+                            np.array(connection_values[0], dtype=float),
+                            np.array(connection_values[1], dtype=bool))
+        entry = (genome, node_genes, connection_genes)
+        self.genes[id(genome)] = entry
+        return entry
+
+    def _code(self, name):
+        return self.names.setdefault(name, len(self.names))
+
+    @staticmethod
+    def _columns(columns, keys):
+        return np.array([columns.setdefault(k, len(columns)) for k in keys], dtype=int)
+
+    def _node_terms(self, values0, values1):
+        bias0, response0, activation0, aggregation0 = values0
+        bias1, response1, activation1, aggregation1 = values1
+        # Same operations as DefaultNodeGene.distance.
+        d = np.abs(bias0 - bias1) + np.abs(response0 - response1)
+        d = d + (activation0 != activation1)
+        d = d + (aggregation0 != aggregation1)
+        return d * self.config.compatibility_weight_coefficient
+
+    def _connection_terms(self, values0, values1):
+        weight0, enabled0 = values0
+        weight1, enabled1 = values1
+        # Same operations as DefaultConnectionGene.distance.
+        d = np.abs(weight0 - weight1)
+        d = d + (enabled0 != enabled1)
+        return d * self.config.compatibility_weight_coefficient
+
+    def _gene_distances(self, genes0, genes1, num_columns, terms):
+        """
+        Returns the node or connection part of the distances between two lists of genomes, given
+        by their genes (columns, attribute values...).
+        """
+        n0, n1 = len(genes0), len(genes1)
+        length0 = np.array([len(g[0]) for g in genes0], dtype=int)
+        length1 = np.array([len(g[0]) for g in genes1], dtype=int)
+        num_values = len(genes0[0]) - 1 if genes0 else 0
+
+        # Genes of genomes0 padded to the same length, in their order.
+        width = max(1, int(length0.max()) if n0 else 1)
+        valid0 = np.arange(width) < length0[:, None]
+        columns0 = np.zeros((n0, width), dtype=int)
+        values0 = [np.zeros((n0, width), dtype=genes0[0][k+1].dtype) for k in range(num_values)]
+        for i, g in enumerate(genes0):
+            columns0[i, :length0[i]] = g[0]
+            for k in range(num_values):
+                values0[k][i, :length0[i]] = g[k+1]
+
+        # Genes of genomes1 in dense (column, genome) tables.
+        rows = np.repeat(np.arange(n1), length1)
+        columns = np.concatenate([g[0] for g in genes1]) if n1 else np.zeros(0, dtype=int)
+        present1 = np.zeros((max(num_columns, 1), n1), dtype=bool)
+        present1[columns, rows] = True
+        values1 = []
+        for k in range(num_values):
+            table = np.zeros((max(num_columns, 1), n1), dtype=values0[k].dtype)
+            if n1:
+                table[columns, rows] = np.concatenate([g[k+1] for g in genes1])
+            values1.append(table)
+
+        # (genome0, gene of genome0, genome1) arrays of the homologous genes and their distances.
+        homologous = valid0[:, :, None] & present1[columns0]
+        d = terms([v[:, :, None] for v in values0], [v[columns0] for v in values1])
+        total = np.cumsum(np.where(homologous, d, 0.0), axis=1)[:, -1, :]
+
+        disjoint = length0[:, None] + length1[None, :] - 2 * homologous.sum(axis=1)
+        max_genes = np.maximum(length0[:, None], length1[None, :])
+        disjoint_coefficient = self.config.compatibility_disjoint_coefficient
+        return np.where(max_genes > 0, (total + disjoint_coefficient * disjoint) / np.maximum(max_genes, 1), 0.0)
@@ -5,6 +5,7 @@ from __future__ import division, print_function
 from itertools import count
 from random import choice, random, shuffle
 
+import hashlib
 import sys
 
 from neat.activations import ActivationFunctionSet
@@ -172,8 +173,12 @@ class DefaultGenome(object):
         # Fitness results.
         self.fitness = None
 
+        # Incremented whenever the genes are changed, so that cached phenotypes can be invalidated.
+        self.version = 0
+
     def configure_new(self, config):
         """Configure a new genome based on the given configuration."""
+        self.version += 1
 
         # Create node genes for the output pins.
         for node_key in config.output_keys:
@@ -233,6 +238,7 @@ class DefaultGenome(object):
 
     def configure_crossover(self, genome1, genome2, config):
         """ Configure a new genome by crossover from two parent genomes. """
+        self.version += 1
         assert isinstance(genome1.fitness, (int, float))
         assert isinstance(genome2.fitness, (int, float))
         if genome1.fitness > genome2.fitness:
@@ -266,6 +272,19 @@ class DefaultGenome(object):
 
     def mutate(self, config):
         """ Mutates this genome. """
+        self.mutate_structure(config)
+
+        # Mutate connection genes.
+        for cg in self.connections.values():
+            cg.mutate(config)
+
+        # Mutate node genes (bias, response, etc.).
+        for ng in self.nodes.values():
+            ng.mutate(config)
+
+    def mutate_structure(self, config):
+        """ Applies the structural mutations of mutate (adding or deleting nodes and connections). """
+        self.version += 1
 
         if config.single_structural_mutation:
             div = max(1,(config.node_add_prob + config.node_delete_prob +
@@ -294,14 +313,6 @@ class DefaultGenome(object):
             if random() < config.conn_delete_prob:
                 self.mutate_delete_connection()
 
-        # Mutate connection genes.
-        for cg in self.connections.values():
-            cg.mutate(config)
-
-        # Mutate node genes (bias, response, etc.).
-        for ng in self.nodes.values():
-            ng.mutate(config)
-
     def mutate_add_node(self, config):
         if not self.connections:
             if config.check_structural_mutation_surer():
@@ -445,6 +456,18 @@ class DefaultGenome(object):
         distance = node_distance + connection_distance
         return distance
 
+    def fingerprint(self):
+        """
+        Returns a hash of the genome's genes (gene keys and attribute values).
+        Genomes with identical genes have the same fingerprint, independent of
+        their key and fitness.
+        """
+        values = []
+        for genes in (self.nodes, self.connections):
+            values.append([(k,) + tuple(getattr(genes[k], a.name) for a in genes[k]._gene_attributes)
+                           for k in sorted(genes)])
+        return hashlib.sha1(repr(values).encode()).hexdigest()
+
     def size(self):
         """
         Returns genome 'complexity', taken to be
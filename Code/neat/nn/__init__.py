@@ -1,2 +1,3 @@
-from neat.nn.feed_forward import FeedForwardNetwork
+from neat.nn.feed_forward import FeedForwardNetwork, CompiledFeedForwardNetwork
 from neat.nn.recurrent import RecurrentNetwork
+from neat.nn.batched import BatchedNetworks
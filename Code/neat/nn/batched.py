@@ -0,0 +1,125 @@
+import numpy as np
+
+from neat.activations import vectorize_activation
+from neat.aggregations import sum_aggregation
+from neat.nn.feed_forward import FeedForwardNetwork, split_layers
+
+
+class BatchedNetworks(object):
+    """
+    Evaluates many feed-forward networks at once. The topologies are padded into a shared
+    layout: every network gets a value row of the same width (inputs, outputs, hidden nodes
+    and one unused slot that padding nodes write to), and layer l of all networks is stored
+    as a (num_networks, layer width, row width) weight tensor. A (num_networks, num_inputs)
+    input matrix is then evaluated with one batched matrix product per layer.
+
+    A network occurring several times in the list is only compiled once. Networks with
+    aggregation functions other than sum are evaluated individually.
+    The outputs equal those of FeedForwardNetwork.activate up to floating point rounding.
+    """
+    def __init__(self, nets):
+        num_nets = len(nets)
+        num_inputs = len(nets[0].input_nodes)
+        num_outputs = len(nets[0].output_nodes)
+        for net in nets:
+            if len(net.input_nodes) != num_inputs or len(net.output_nodes) != num_outputs:
+                raise RuntimeError("All networks must have the same number of inputs and outputs")
+
+        self.nets = nets
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+
+        # Row of each network in the compiled tensors.
+        unique = {}
+        for net in nets:
+            if id(net) not in unique:
+                unique[id(net)] = (len(unique), net)
+        index = np.array([unique[id(net)][0] for net in nets], dtype=int)
+        unique_nets = [net for i, net in sorted(unique.values(), key=lambda x: x[0])]
+        num_unique = len(unique_nets)
+
+        # Value slots of each network: inputs, outputs, then the other evaluated nodes.
+        slots = []
+        layers = []
+        for net in unique_nets:
+            slot = {}
+            for key in net.input_nodes + net.output_nodes:
+                slot[key] = len(slot)
+            for node_eval in net.node_evals:
+                if node_eval[0] not in slot:
+                    slot[node_eval[0]] = len(slot)
+            slots.append(slot)
+            layers.append(split_layers(net.node_evals))
+
+        # The last slot of each row receives the values of padding nodes.
+        self.num_values = max(len(s) for s in slots) + 1
+        pad_slot = self.num_values - 1
+        num_layers = max([len(l) for l in layers] + [0])
+
+        act_funcs = []
+        self.layers = []
+        for l in range(num_layers):
+            width = max(len(net_layers[l]) if l < len(net_layers) else 0 for net_layers in layers)
+            weights = np.zeros((num_unique, width, self.num_values))
+            bias = np.zeros((num_unique, width))
+            response = np.zeros((num_unique, width))
+            targets = np.full((num_unique, width), pad_slot, dtype=int)
+            activation = np.zeros((num_unique, width), dtype=int)
+            for n, net_layers in enumerate(layers):
+                if l >= len(net_layers):
+                    continue
+                for k, (node, act_func, agg_func, b, r, links) in enumerate(net_layers[l]):
+                    for i, w in links:
+                        weights[n, k, slots[n][i]] += w
+                    bias[n, k] = b
+                    response[n, k] = r
+                    targets[n, k] = slots[n][node]
+                    if act_func not in act_funcs:
+                        act_funcs.append(act_func)
+                    activation[n, k] = act_funcs.index(act_func)
+            self.layers.append(tuple(a[index] for a in (weights, bias, response, targets, activation)))
+
+        self.activations = [vectorize_activation(f) for f in act_funcs]
+        self.rows = np.arange(num_nets)[:, None]
+        self.unbatched = [n for n, net in enumerate(nets)
+                          if any(e[2] is not sum_aggregation for e in net.node_evals)]
+
+    @staticmethod
+    def create(genomes, config):
+        """
+        Receives a list of genomes and returns their phenotypes as BatchedNetworks.
+        Genomes occurring several times in the list share one built network.
+        """
+        nets = {}
+        for g in genomes:
+            if id(g) not in nets:
+                nets[id(g)] = FeedForwardNetwork.create(g, config)
+        return BatchedNetworks([nets[id(g)] for g in genomes])
+
+    def activate(self, inputs):
+        """
+        Evaluates all networks, row n of the (num_networks, num_inputs) input matrix is
+        the input of network n. Returns a (num_networks, num_outputs) output matrix.
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.shape != (len(self.nets), self.num_inputs):
+            raise RuntimeError("Expected inputs of shape {0!r}, got {1!r}".format(
+                (len(self.nets), self.num_inputs), inputs.shape))
+
+        values = np.zeros((len(self.nets), self.num_values))
+        values[:, :self.num_inputs] = inputs
+        for weights, bias, response, targets, activation in self.layers:
+            z = bias + response * np.matmul(weights, values[:, :, None])[:, :, 0]
+            if len(self.activations) == 1:
+                a = self.activations[0](z)
+            else:
+                a = np.zeros_like(z)
+                for i, f in enumerate(self.activations):
+                    mask = activation == i
+                    a[mask] = f(z[mask])
+            values[self.rows, targets] = a
+
+        outputs = values[:, self.num_inputs:self.num_inputs + self.num_outputs]
+        for n in self.unbatched:
+            outputs[n] = self.nets[n].activate(list(inputs[n]))
+        return outputs
@@ -1,3 +1,7 @@
+import numpy as np
+
+from neat.activations import vectorize_activation
+from neat.aggregations import sum_aggregation
 from neat.graphs import feed_forward_layers
 from neat.six_util import itervalues
 
@@ -37,14 +41,11 @@ class FeedForwardNetwork(object):
         for layer in layers:
             for node in layer:
                 inputs = []
-                node_expr = [] # currently unused
                 for conn_key in connections:
                     inode, onode = conn_key
                     if onode == node:
                         cg = genome.connections[conn_key]
                         inputs.append((inode, cg.weight))
-                        node_expr.append("v[{}] * {:.7e}".format(inode, cg.weight))
-
 
                 ng = genome.nodes[node]
                 aggregation_function = config.genome_config.aggregation_function_defs.get(ng.aggregation)
@@ -54,3 +55,114 @@ class FeedForwardNetwork(object):
         return FeedForwardNetwork(config.genome_config.input_keys, config.genome_config.output_keys, node_evals)
 
 
+def split_layers(node_evals):
+    """
+    Splits the evaluation order of a FeedForwardNetwork into layers: a node starts
+    a new layer if it depends on a node of the current layer.
+    """
+    layers = []
+    current = set()
+    for node_eval in node_evals:
+        node, links = node_eval[0], node_eval[5]
+        if not layers or any(i in current for i, w in links):
+            layers.append([])
+            current = set()
+        layers[-1].append(node_eval)
+        current.add(node)
+    return layers
+
+
+class CompiledFeedForwardNetwork(object):
+    """
+    A FeedForwardNetwork compiled into NumPy arrays. All values are kept in one vector; each
+    layer of nodes with sum aggregation and the same activation function is evaluated with
+    one matrix-vector product, a bias and response vector and a vectorized activation.
+    Nodes with other aggregation functions are evaluated one by one.
+
+    The outputs equal those of FeedForwardNetwork.activate up to floating point rounding. On the
+    small networks evolved here the NumPy calls cost more than the few products they replace,
+    so FeedForwardNetwork remains the default phenotype.
+    """
+    def __init__(self, net, num_values, output_slots, layers):
+        # Nodes and evaluation order of the FeedForwardNetwork, so the compiled network can be
+        # used wherever one is expected (e.g. by BatchedNetworks).
+        self.input_nodes = net.input_nodes
+        self.output_nodes = net.output_nodes
+        self.node_evals = net.node_evals
+        self.num_inputs = len(net.input_nodes)
+        self.output_slots = output_slots
+        # Each layer is a tuple (groups, nodes): groups are evaluated with matrix products,
+        # nodes individually. Group: (slots, weights, bias, response, activation).
+        # Node: (slot, act_func, agg_func, bias, response, input slots, weights).
+        self.layers = layers
+        self.values = np.zeros(num_values)
+
+    def activate(self, inputs):
+        if self.num_inputs != len(inputs):
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, len(inputs)))
+
+        values = self.values
+        values[:self.num_inputs] = inputs
+        for groups, nodes in self.layers:
+            if len(groups) == 1 and not nodes:
+                slots, weights, bias, response, activation = groups[0]
+                values[slots] = activation(bias + response * weights.dot(values))
+                continue
+
+            # All nodes of a layer only depend on values of earlier layers.
+            new_values = []
+            for slots, weights, bias, response, activation in groups:
+                new_values.append((slots, activation(bias + response * weights.dot(values))))
+            for slot, act_func, agg_func, bias, response, in_slots, weights in nodes:
+                s = agg_func(list(values[in_slots] * weights))
+                new_values.append((slot, act_func(bias + response * s)))
+            for slots, v in new_values:
+                values[slots] = v
+
+        return values[self.output_slots].tolist()
+
+    @staticmethod
+    def create(genome, config):
+        """ Receives a genome and returns its phenotype (a CompiledFeedForwardNetwork). """
+        return CompiledFeedForwardNetwork.compile(FeedForwardNetwork.create(genome, config))
+
+    @staticmethod
+    def compile(net):
+        """ Compiles a FeedForwardNetwork into a CompiledFeedForwardNetwork. """
+        # Slots in the value vector: inputs first, then outputs, then the other evaluated nodes.
+        slot = {}
+        for key in net.input_nodes + net.output_nodes:
+            slot[key] = len(slot)
+        for node_eval in net.node_evals:
+            if node_eval[0] not in slot:
+                slot[node_eval[0]] = len(slot)
+        num_values = len(slot)
+
+        layer_evals = split_layers(net.node_evals)
+
+        layers = []
+        for node_evals in layer_evals:
+            by_activation = {}
+            nodes = []
+            for node, act_func, agg_func, bias, response, links in node_evals:
+                if agg_func is sum_aggregation:
+                    by_activation.setdefault(act_func, []).append((node, bias, response, links))
+                else:
+                    in_slots = np.array([slot[i] for i, w in links], dtype=int)
+                    weights = np.array([w for i, w in links], dtype=float)
+                    nodes.append((slot[node], act_func, agg_func, bias, response, in_slots, weights))
+
+            groups = []
+            for act_func, members in by_activation.items():
+                weights = np.zeros((len(members), num_values))
+                for row, (node, bias, response, links) in enumerate(members):
+                    for i, w in links:
+                        weights[row, slot[i]] += w
+                slots = np.array([slot[m[0]] for m in members], dtype=int)
+                bias = np.array([m[1] for m in members], dtype=float)
+                response = np.array([m[2] for m in members], dtype=float)
+                groups.append((slots, weights, bias, response, vectorize_activation(act_func)))
+            layers.append((groups, nodes))
+
+        output_slots = np.array([slot[k] for k in net.output_nodes], dtype=int)
+        return CompiledFeedForwardNetwork(net, num_values, output_slots, layers)
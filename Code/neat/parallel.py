@@ -2,7 +2,16 @@
 Runs evaluation functions in parallel subprocesses
 in order to evaluate multiple genomes at once.
 """
-from multiprocessing import Pool
+import os
+import random
+import time
+import traceback
+from multiprocessing import Pool, Process, Queue
+from queue import Empty
+
+import numpy as np
+
+from neat.math_util import mean
 
 class ParallelEvaluator(object):
     def __init__(self, num_workers, eval_function, timeout=None):
@@ -28,3 +37,224 @@ class ParallelEvaluator(object):
         # assign the fitness back to each genome
         for job, (ignored_genome_id, genome) in zip(jobs, genomes):
             genome.fitness = job.get(timeout=self.timeout)
+
+
+def _coevolution_worker(worker_id, eval_function, context_function, context_queue, task_queue,
+                        result_queue, seed):
+    """
+    Worker loop of CoevolutionParallelEvaluator. Tasks refer to the context (partner genome and
+    both configs) they belong to; a new context is read from the worker's own context queue
+    whenever the first task of a new evaluation arrives, and context_function (if any) is called.
+    Results are (job id, fitness, worker id, seconds, error), error is the formatted traceback if
+    eval_function raised an exception and None otherwise.
+    """
+    # Forked workers inherit the random state of the parent, so reseed them individually.
+    if seed is None:
+        seed = int.from_bytes(os.urandom(4), 'little')
+    else:
+        seed += worker_id
+    random.seed(seed)
+    np.random.seed(seed % (2**32))
+
+    context_id = None
+    context = None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_context_id, job_id, repeat, genome = task
+        if context_id != task_context_id:
+            while context_id != task_context_id:
+                context_id, context = context_queue.get()
+            if context_function is not None:
+                context_function()
+        config_ground, config_aerial, partner, eval_type, scenarios = context
+
+        if eval_type == 0:
+            genome_ground, genome_aerial = genome, partner
+        elif eval_type == 1:
+            genome_ground, genome_aerial = partner, genome
+        else:
+            # The task carries a complete (ground, aerial) pair.
+            genome_ground, genome_aerial = genome
+
+        start = time.time()
+        fitness, error = None, None
+        try:
+            if scenarios is None:
+                fitness = eval_function(genome_ground, genome_aerial, config_ground, config_aerial)
+            else:
+                fitness = eval_function(genome_ground, genome_aerial, config_ground, config_aerial,
+                                        scenario=scenarios[repeat])
+        except Exception: # pylint: disable=broad-except
+            error = traceback.format_exc()
+        result_queue.put((job_id, fitness, worker_id, time.time() - start, error))
+
+
+class CoevolutionParallelEvaluator(object):
+    """
+    Evaluates one population of a two-population coevolution against a partner genome
+    in parallel subprocesses. Can be passed to Population.run as fitness function.
+
+    The partner genome and both configs are sent to the persistent workers once per
+    evaluation; afterwards only the evaluated genomes travel, as one job per genome and repeat.
+    """
+    def __init__(self, num_workers, eval_function, num_evals=1, timeout=None, seed=None,
+                 verbose=False, context_function=None):
+        """
+        eval_function should take four arguments (ground genome, aerial genome, ground config,
+        aerial config) and return a single float (the fitness of the pair). It must be picklable,
+        i.e. defined at module level. If run_jobs is given scenarios, it is also called with the
+        keyword argument scenario.
+
+        :param int num_workers: Number of worker processes.
+        :param int num_evals: Number of evaluations of each genome, its fitness is their mean.
+        :param timeout: Maximum number of seconds to wait for a single result (None = no limit).
+        :param seed: If not None, worker i seeds `random` and `numpy.random` with seed + i.
+        :param bool verbose: Print the per-worker throughput after each evaluation.
+        :param context_function: Function without arguments that is called in each worker when
+            it starts working on a new evaluation, e.g. to drop data cached for past evaluations.
+            It must be picklable like eval_function.
+        """
+        self.num_workers = num_workers
+        self.eval_function = eval_function
+        self.num_evals = num_evals
+        self.timeout = timeout
+        self.seed = seed
+        self.verbose = verbose
+        self.context_function = context_function
+
+        self.workers = []
+        self.context_queues = []
+        self.task_queue = None
+        self.result_queue = None
+        self.working = False
+        self.context_id = 0
+
+        # Number of jobs and busy time of each worker, summed over all evaluations.
+        self.worker_jobs = [0] * num_workers
+        self.worker_time = [0.0] * num_workers
+
+    def __del__(self):
+        if self.working:
+            self.stop()
+
+    def start(self):
+        """Starts the worker processes."""
+        if self.working:
+            return
+        self.working = True
+        self.task_queue = Queue()
+        self.result_queue = Queue()
+        self.context_queues = [Queue() for i in range(self.num_workers)]
+        for i in range(self.num_workers):
+            w = Process(target=_coevolution_worker,
+                        args=(i, self.eval_function, self.context_function, self.context_queues[i],
+                              self.task_queue, self.result_queue, self.seed),
+                        name="Coevolution Worker #{0}".format(i))
+            w.daemon = True
+            w.start()
+            self.workers.append(w)
+
+    def terminate(self):
+        """Kills the worker processes, e.g. after a failed evaluation left tasks in the queues."""
+        self.working = False
+        for w in self.workers:
+            w.terminate()
+        for w in self.workers:
+            w.join()
+        self.workers = []
+
+    def stop(self):
+        """Stops the worker processes and waits for them to finish."""
+        self.working = False
+        for w in self.workers:
+            self.task_queue.put(None)
+        for w in self.workers:
+            w.join()
+        self.workers = []
+
+    def run_jobs(self, genomes, partner, config_ground, config_aerial, eval_type, num_evals=None,
+                 scenarios=None):
+        """
+        Evaluates each entry of `genomes` num_evals times (default: the num_evals given to
+        the constructor) and returns a list with the list of results of each entry.
+        eval_type 0 pairs ground genomes with the aerial `partner`, eval_type 1 aerial genomes
+        with the ground `partner`, and eval_type 2 expects (ground genome, aerial genome)
+        tuples and ignores `partner`. If `scenarios` is not None, repeat i of every entry is
+        evaluated with scenarios[i] (common random numbers for all entries).
+        """
+        if not self.working:
+            self.start()
+        if num_evals is None:
+            num_evals = self.num_evals
+
+        self.context_id += 1
+        context = (config_ground, config_aerial, partner, eval_type, scenarios)
+        for q in self.context_queues:
+            q.put((self.context_id, context))
+
+        num_jobs = 0
+        for genome in genomes:
+            for i in range(num_evals):
+                self.task_queue.put((self.context_id, num_jobs, i, genome))
+                num_jobs += 1
+
+        start = time.time()
+        jobs = [0] * self.num_workers
+        busy = [0.0] * self.num_workers
+        results = [None] * num_jobs
+        for i in range(num_jobs):
+            job_id, fitness, worker_id, elapsed, error = self._get_result()
+            if error is not None:
+                self.terminate()
+                raise RuntimeError("Evaluation of job {0:d} failed in worker {1:d}:\n{2}".format(
+                    job_id, worker_id, error))
+            results[job_id] = fitness
+            jobs[worker_id] += 1
+            busy[worker_id] += elapsed
+
+        for i in range(self.num_workers):
+            self.worker_jobs[i] += jobs[i]
+            self.worker_time[i] += busy[i]
+        if self.verbose:
+            elapsed = time.time() - start
+            rates = " ".join("{0:.1f}".format(j / b if b > 0 else 0.0) for j, b in zip(jobs, busy))
+            print("Evaluated {0:d} jobs on {1:d} workers in {2:.3f} sec, jobs/sec per worker: {3}".format(
+                num_jobs, self.num_workers, elapsed, rates))
+
+        return [results[i * num_evals:(i + 1) * num_evals] for i in range(len(genomes))]
+
+    def _get_result(self):
+        """
+        Returns the next result. Raises RuntimeError (after terminating the workers) if a worker
+        died or no result arrived within the timeout.
+        """
+        waited = 0.0
+        while True:
+            poll = 1.0 if self.timeout is None else min(1.0, self.timeout - waited)
+            try:
+                return self.result_queue.get(timeout=max(poll, 0.0))
+            except Empty:
+                waited += poll
+                dead = [w.name for w in self.workers if not w.is_alive()]
+                if dead:
+                    self.terminate()
+                    raise RuntimeError("Worker processes died: {0}".format(", ".join(dead)))
+                if self.timeout is not None and waited >= self.timeout:
+                    self.terminate()
+                    raise RuntimeError("No result within {0} seconds".format(self.timeout))
+
+    def evaluate(self, genomes, partner, config_ground, config_aerial, type=0):
+        """
+        Fitness function interface of Population.run: sets the fitness of each genome in the
+        list of (genome id, genome) tuples to the mean result of its evaluations with partner.
+        """
+        genome_list = [genome for ignored_genome_id, genome in genomes]
+        results = self.run_jobs(genome_list, partner, config_ground, config_aerial, type)
+        for genome, fit in zip(genome_list, results):
+            genome.fitness = mean(fit)
+
+    def throughput(self):
+        """Returns the number of evaluated jobs per busy second of each worker."""
+        return [j / t if t > 0 else 0.0 for j, t in zip(self.worker_jobs, self.worker_time)]
@@ -1,8 +1,12 @@
 """Implements the core evolution algorithm."""
 from __future__ import print_function
 
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
 from neat.reporting import ReporterSet
 from neat.math_util import mean
+from neat.species import GenomeDistanceCache
 from neat.six_util import iteritems, itervalues
 import numpy as np
 
@@ -47,31 +51,86 @@ class Population(object):
             raise RuntimeError(
                 "Unexpected fitness_criterion: {0!r}".format(self.config.fitness_criterion))
 
+        self.species_ground = config_ground.species_set_type(config_ground.species_set_config, self.reporters)
+        self.species_aerial = config_aerial.species_set_type(config_aerial.species_set_config, self.reporters)
+        # Both species sets keep their genetic distances in one cache, apart by namespace.
+        if hasattr(self.species_ground, 'distance_cache') and hasattr(self.species_aerial, 'distance_cache'):
+            self.species_ground.distance_cache = GenomeDistanceCache(config_ground.genome_config, 'ground')
+            self.species_aerial.distance_cache = GenomeDistanceCache(config_aerial.genome_config, 'aerial',
+                                                                     self.species_ground.distance_cache)
+
         if initial_state is None:
             # Create a population from scratch, then partition into species.
             self.population_ground = self.reproduction_ground.create_new(config_ground.genome_type,
                                                            config_ground.genome_config,
                                                            config_ground.pop_size)
-            self.species_ground = config_ground.species_set_type(config_ground.species_set_config, self.reporters)
             self.generation_ground = 0
             self.species_ground.speciate(config_ground, self.population_ground, self.generation_ground)
 
             self.population_aerial = self.reproduction_aerial.create_new(config_aerial.genome_type,
                                                            config_aerial.genome_config,
                                                            config_aerial.pop_size)
-            self.species_aerial = config_aerial.species_set_type(config_aerial.species_set_config, self.reporters)
             self.generation_aerial = 0
             self.species_aerial.speciate(config_aerial, self.population_aerial, self.generation_aerial)
-        else:
-            raise RuntimeError("Not implemented")
-            self.population, self.species, self.generation = initial_state
 
+            self.best_genome_ground = self.population_ground.get(1)
+            self.best_genome_aerial = self.population_aerial.get(1)
+            self.best_genome_ground_overall = None
+            self.best_genome_aerial_overall = None
+            self.best_fitness_overall = 0
+
+            # best pair and max, min, average fitness of each evaluated population, see run
+            self.best_pair = []
+            self.max_fitn = []
+            self.min_fitn = []
+            self.avg_fitn = []
+        else:
+            self.set_state(initial_state)
 
-        self.best_genome_ground = self.population_ground.get(1)
-        self.best_genome_aerial = self.population_aerial.get(1)
-        self.best_genome_ground_overall = None
-        self.best_genome_aerial_overall = None
-        self.best_fitness_overall = 0
+    def get_state(self):
+        """
+        Returns the complete evolution state of both populations as a dictionary that can be
+        pickled and passed as initial_state to a new Population with the same configs
+        (see CoevolutionCheckpointer). Random number generator states are not included.
+        """
+        state = {'best_genome_ground': self.best_genome_ground,
+                 'best_genome_aerial': self.best_genome_aerial,
+                 'best_genome_ground_overall': self.best_genome_ground_overall,
+                 'best_genome_aerial_overall': self.best_genome_aerial_overall,
+                 'best_fitness_overall': self.best_fitness_overall,
+                 'best_pair': self.best_pair,
+                 'max_fitn': self.max_fitn,
+                 'min_fitn': self.min_fitn,
+                 'avg_fitn': self.avg_fitn}
+        for name in ('ground', 'aerial'):
+            config = getattr(self, 'config_' + name)
+            species = getattr(self, 'species_' + name)
+            reproduction = getattr(self, 'reproduction_' + name)
+            state['generation_' + name] = getattr(self, 'generation_' + name)
+            state['population_' + name] = getattr(self, 'population_' + name)
+            state['species_' + name] = (species.species, species.genome_to_species, _peek(species, 'indexer'))
+            state['reproduction_' + name] = (_peek(reproduction, 'genome_indexer'), reproduction.ancestors)
+            state['node_indexer_' + name] = _peek(config.genome_config, 'node_indexer')
+        return state
+
+    def set_state(self, state):
+        """Restores the evolution state returned by get_state."""
+        for name in ('ground', 'aerial'):
+            config = getattr(self, 'config_' + name)
+            species = getattr(self, 'species_' + name)
+            reproduction = getattr(self, 'reproduction_' + name)
+            setattr(self, 'generation_' + name, state['generation_' + name])
+            setattr(self, 'population_' + name, state['population_' + name])
+            species.species, species.genome_to_species, next_key = state['species_' + name]
+            species.indexer = count(next_key)
+            next_key, reproduction.ancestors = state['reproduction_' + name]
+            reproduction.genome_indexer = count(next_key)
+            next_key = state['node_indexer_' + name]
+            config.genome_config.node_indexer = None if next_key is None else count(next_key)
+        for key in ('best_genome_ground', 'best_genome_aerial', 'best_genome_ground_overall',
+                    'best_genome_aerial_overall', 'best_fitness_overall', 'best_pair',
+                    'max_fitn', 'min_fitn', 'avg_fitn'):
+            setattr(self, key, state[key])
 
     def add_reporter(self, reporter):
         self.reporters.add(reporter)
@@ -79,11 +138,32 @@ class Population(object):
     def remove_reporter(self, reporter):
         self.reporters.remove(reporter)
 
-    def run(self, fitness_function, n=None):
+    def run(self, fitness_function, n=None, update_scheme='sequential', generation_log=None,
+            checkpointer=None):
         """
         Runs NEAT's genetic algorithm for at most n generations.  If n
         is None, run until solution is found or extinction occurs.
 
+        update_scheme selects the partners each population is evaluated with:
+            'sequential': the ground population is evaluated with the best aerial
+                genome of the previous generation, then the aerial population with
+                the best ground genome just found (Gauss-Seidel style).
+            'concurrent': both populations are evaluated at the same time, each with
+                the best partner of the previous generation (Jacobi style). The two
+                calls of fitness_function run in separate threads, so it must be
+                thread-safe; it only gains time if it waits for other processes.
+
+        If generation_log is given, the best pair and fitness statistics of each
+        evaluated population are passed to generation_log.append(generation, population,
+        best ground genome, best aerial genome, max, min, average) as soon as they are
+        known, and the returned best pairs and fitness statistics are read back from the
+        log (generation_log.best_pairs() and generation_log.fitness_series()) instead of
+        lists kept in memory, so they neither grow in memory nor in checkpoints.
+
+        If checkpointer is given, checkpointer.end_generation(self) is called after each
+        complete generation. The fitness statistics and best pairs accumulate over all
+        calls of run, so a Population restored from a checkpoint continues them.
+
         The user-provided fitness_function must take only two arguments:
             1. The population as a list of (genome id, genome) tuples.
             2. The current configuration object.
@@ -101,22 +181,33 @@ class Population(object):
 
         if self.config.no_fitness_termination and (n is None):
             raise RuntimeError("Cannot have no generational limit with no fitness termination")
+        if update_scheme not in ('sequential', 'concurrent'):
+            raise RuntimeError("Unexpected update_scheme: {0!r}".format(update_scheme))
+        executor = ThreadPoolExecutor(max_workers=2) if update_scheme == 'concurrent' else None
 
         k = 0
         # list of tuples of best pair per generation
-        best_pair = []
+        best_pair = self.best_pair
         # lists of max, min, average fitnesses per generation
-        max_fitn = []
-        min_fitn = []
-        avg_fitn = []
+        max_fitn = self.max_fitn
+        min_fitn = self.min_fitn
+        avg_fitn = self.avg_fitn
         while n is None or k < n:
             k += 1
             self.reporters.start_generation(self.generation_ground)
             self.reporters.start_generation(self.generation_aerial)
 
             # Evaluate all genomes using the user-provided function.
-            #### evaluate ground population
-            fitness_function(list(iteritems(self.population_ground)), self.best_genome_aerial, self.config_ground, self.config_aerial, type = 0)
+            partner_aerial = self.best_genome_aerial
+            if executor is not None:
+                #### evaluate ground and aerial population at the same time
+                jobs = [executor.submit(fitness_function, list(iteritems(self.population_ground)), partner_aerial, self.config_ground, self.config_aerial, type = 0),
+                        executor.submit(fitness_function, list(iteritems(self.population_aerial)), self.best_genome_ground, self.config_ground, self.config_aerial, type = 1)]
+                for job in jobs:
+                    job.result()
+            else:
+                #### evaluate ground population
+                fitness_function(list(iteritems(self.population_ground)), partner_aerial, self.config_ground, self.config_aerial, type = 0)
 
             best_ground = None
             fitness_ground = []
@@ -132,20 +223,27 @@ class Population(object):
                 fitness_ground.append(g.fitness)
 
 
-            max_fitn.append(np.amax(fitness_per_gen))
-            min_fitn.append(np.amin(fitness_per_gen))
-            avg_fitn.append(np.average(fitness_per_gen))
-            best_pair.append((best_ground, self.best_genome_aerial))
+            stats = (np.amax(fitness_per_gen), np.amin(fitness_per_gen), np.average(fitness_per_gen))
+            if generation_log is not None:
+                generation_log.append(self.generation_ground, 0, best_ground, partner_aerial, *stats)
+            else:
+                best_pair.append((best_ground, partner_aerial))
+                max_fitn.append(stats[0])
+                min_fitn.append(stats[1])
+                avg_fitn.append(stats[2])
 
             # Track the best genomes ever seen.
             if self.best_genome_ground_overall is None or best_fitness > self.best_fitness_overall:
                 self.best_genome_ground_overall = best_ground
-                self.best_genome_aerial_overall = self.best_genome_aerial
+                self.best_genome_aerial_overall = partner_aerial
                 self.best_fitness_overall = best_fitness
+            partner_ground = self.best_genome_ground
             self.best_genome_ground = best_ground
 
-            #### evaluate aerial population
-            fitness_function(list(iteritems(self.population_aerial)), self.best_genome_ground, self.config_ground, self.config_aerial, type = 1)
+            if executor is None:
+                #### evaluate aerial population
+                partner_ground = self.best_genome_ground
+                fitness_function(list(iteritems(self.population_aerial)), partner_ground, self.config_ground, self.config_aerial, type = 1)
 
             # Gather and report statistics.
             best_aerial = None
@@ -161,10 +259,14 @@ class Population(object):
                     best_fitness = a.fitness
                 fitness_aerial.append(a.fitness)
 
-            max_fitn.append(np.amax(fitness_per_gen))
-            min_fitn.append(np.amin(fitness_per_gen))
-            avg_fitn.append(np.average(fitness_per_gen))
-            best_pair.append((self.best_genome_ground, best_aerial))
+            stats = (np.amax(fitness_per_gen), np.amin(fitness_per_gen), np.average(fitness_per_gen))
+            if generation_log is not None:
+                generation_log.append(self.generation_aerial, 1, partner_ground, best_aerial, *stats)
+            else:
+                best_pair.append((partner_ground, best_aerial))
+                max_fitn.append(stats[0])
+                min_fitn.append(stats[1])
+                avg_fitn.append(stats[2])
 
             print("\n reporter ground: ")
             self.reporters.post_evaluate(self.config_ground, self.population_ground, self.species_ground, best_ground)
@@ -174,7 +276,7 @@ class Population(object):
             # Track the best genomes ever seen.
             if self.best_genome_ground_overall is None or best_fitness > self.best_fitness_overall:
                 self.best_genome_aerial_overall = best_aerial
-                self.best_genome_ground_overall= self.best_genome_ground
+                self.best_genome_ground_overall= partner_ground
                 self.best_fitness_overall = best_fitness
             self.best_genome_ground = best_ground
             self.best_genome_aerial = best_aerial
@@ -201,8 +303,30 @@ class Population(object):
             self.generation_ground += 1
             self.generation_aerial += 1
 
+            if checkpointer is not None:
+                checkpointer.end_generation(self)
+
+        if executor is not None:
+            executor.shutdown()
+        if generation_log is not None:
+            best_pair = generation_log.best_pairs()
+            max_fitn, min_fitn, avg_fitn = generation_log.fitness_series()
+
         #necessary?
         if self.config.no_fitness_termination:
             self.reporters.found_solution(self.config, self.generation, self.best_genome)
 
         return self.best_genome_ground_overall, self.best_genome_aerial_overall, best_pair, max_fitn, min_fitn, avg_fitn
+
+
+def _peek(obj, name):
+    """
+    Returns the next value of the itertools.count stored as attribute name of obj (None if
+    the attribute is None) and replaces the consumed counter by an equivalent one.
+    """
+    counter = getattr(obj, name)
+    if counter is None:
+        return None
+    value = next(counter)
+    setattr(obj, name, count(value))
+    return value
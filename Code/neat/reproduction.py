@@ -8,6 +8,7 @@ import math
 import random
 from itertools import count
 
+from neat.batch_mutation import mutate_genomes, supports as batch_mutation_supported
 from neat.config import ConfigParameter, DefaultClassConfig
 from neat.math_util import mean
 from neat.six_util import iteritems, itervalues
@@ -28,7 +29,8 @@ class DefaultReproduction(DefaultClassConfig):
         return DefaultClassConfig(param_dict,
                                   [ConfigParameter('elitism', int, 0),
                                    ConfigParameter('survival_threshold', float, 0.2),
-                                   ConfigParameter('min_species_size', int, 2)])
+                                   ConfigParameter('min_species_size', int, 2),
+                                   ConfigParameter('batch_mutation', bool, False)])
 
     def __init__(self, config, reporters, stagnation):
         # pylint: disable=super-init-not-called
@@ -138,6 +140,10 @@ class DefaultReproduction(DefaultClassConfig):
                                            pop_size, min_species_size)
 
         new_population = {}
+        # Offspring whose gene attributes are mutated together, see the batch_mutation option.
+        batch_mutation = (self.reproduction_config.batch_mutation and
+                          batch_mutation_supported(config))
+        children = []
         species.species = {}
         for spawn, s in zip(spawn_amounts, remaining_species):
             # If elitism is enabled, each species always at least gets to retain its elites.
@@ -181,8 +187,16 @@ class DefaultReproduction(DefaultClassConfig):
                 gid = next(self.genome_indexer)
                 child = config.genome_type(gid)
                 child.configure_crossover(parent1, parent2, config.genome_config)
-                child.mutate(config.genome_config)
+                if batch_mutation:
+                    child.mutate_structure(config.genome_config)
+                    children.append(child)
+                else:
+                    child.mutate(config.genome_config)
                 new_population[gid] = child
                 self.ancestors[gid] = (parent1_id, parent2_id)
 
+        # Mutate the gene attributes of all offspring at once.
+        if children:
+            mutate_genomes(children, config.genome_config)
+
         return new_population
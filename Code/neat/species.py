@@ -1,9 +1,13 @@
 """Divides the population into species based on genomic distances."""
+import threading
 from itertools import count
 
+import numpy as np
+
 from neat.math_util import mean, stdev
 from neat.six_util import iteritems, iterkeys, itervalues
 from neat.config import ConfigParameter, DefaultClassConfig
+from neat.distance import GenomeDistanceEngine, gene_counts
 
 class Species(object):
     def __init__(self, key, generation):
@@ -25,27 +29,171 @@ class Species(object):
 
 
 class GenomeDistanceCache(object):
-    def __init__(self, config):
-        self.distances = {}
+    """
+    Symmetric cache of genetic distances that persists across generations. Each pair is stored
+    once and computed as distance from the genome with the smaller key to the other, so a cached
+    value does not depend on the order in which the pair was requested. Genomes must not change
+    while they are cached (NEAT mutates children before they join a population).
+
+    Entries are removed by evict once one of their genomes is no longer alive. Several caches (e.g.
+    of the ground and aerial species sets, whose genome keys overlap) can share their entries by
+    passing `shared`: entries are kept apart by namespace and guarded by a common lock.
+    """
+    def __init__(self, config, namespace=None, shared=None):
         self.config = config
+        self.namespace = namespace
+        if shared is None:
+            self.distances = {}
+            self.lock = threading.Lock()
+        else:
+            self.distances = shared.distances
+            self.lock = shared.lock
+        # Counters of this cache, summed over all generations.
         self.hits = 0
         self.misses = 0
+        # Canonical keys and distances of the pairs requested since the last evict.
+        self.requested = {}
+        # Distances computed in advance by prefetch, used when they are requested.
+        self.engine = GenomeDistanceEngine(config) if GenomeDistanceEngine.supports(config) else None
+        self.prefetched = {}
+
+    def key(self, genome0, genome1):
+        """Returns the key of a pair of genomes, the same for both orders."""
+        if genome0.key <= genome1.key:
+            return self.namespace, genome0.key, genome1.key
+        return self.namespace, genome1.key, genome0.key
+
+    def prefetch(self, genomes0, genomes1):
+        """
+        Computes the distances of all pairs of the two lists that are not cached yet in vectorized
+        passes (if the genome config has the default gene types). The values are the same as those
+        of single distance calls, so results do not depend on which distances were prefetched.
+        """
+        if self.engine is None:
+            return
+        with self.lock:
+            missing = [(i, j) for i, genome0 in enumerate(genomes0) for j, genome1 in enumerate(genomes1)
+                       if self.key(genome0, genome1) not in self.distances]
+        if not missing:
+            return
+        rows = sorted(set(i for i, j in missing))
+        columns = sorted(set(j for i, j in missing))
+        genomes0 = [genomes0[i] for i in rows]
+        genomes1 = [genomes1[j] for j in columns]
+        # Both orders are computed, each pair takes the value of its canonical order.
+        forward = self.engine.distances(genomes0, genomes1).tolist()
+        backward = self.engine.distances(genomes1, genomes0).tolist()
+        for i, genome0 in enumerate(genomes0):
+            for j, genome1 in enumerate(genomes1):
+                if genome0.key <= genome1.key:
+                    self.prefetched[genome0.key, genome1.key] = forward[i][j]
+                else:
+                    self.prefetched[genome1.key, genome0.key] = backward[j][i]
 
     def __call__(self, genome0, genome1):
-        g0 = genome0.key
-        g1 = genome1.key
-        d = self.distances.get((g0, g1))
+        key = self.key(genome0, genome1)
+        with self.lock:
+            d = self.distances.get(key)
         if d is None:
             # Distance is not already computed.
-            d = genome0.distance(genome1, self.config)
-            self.distances[g0, g1] = d
-            self.distances[g1, g0] = d
+            d = self.prefetched.pop(key[1:], None)
+            if d is None:
+                if genome0.key > genome1.key:
+                    genome0, genome1 = genome1, genome0
+                d = genome0.distance(genome1, self.config)
+            with self.lock:
+                self.distances[key] = d
             self.misses += 1
         else:
             self.hits += 1
+        self.requested[key] = d
 
         return d
 
+    def evict(self, live_keys):
+        """Removes the entries of this namespace with a genome whose key is not in live_keys."""
+        live_keys = set(live_keys)
+        with self.lock:
+            for key in [k for k in self.distances if k[0] == self.namespace and
+                        (k[1] not in live_keys or k[2] not in live_keys)]:
+                del self.distances[key]
+        self.requested = {}
+        self.prefetched = {}
+        # Genes read by the engine belong to the genomes of this generation.
+        if self.engine is not None:
+            self.engine = GenomeDistanceEngine(self.config)
+
+    def __len__(self):
+        with self.lock:
+            return sum(1 for k in self.distances if k[0] == self.namespace)
+
+
+class RepresentativeIndex(object):
+    """
+    Finds the species whose representative is closest to a genome, with the result of comparing the
+    genome with every representative in order.
+
+    The compatibility distance is normalized by the genome sizes and does not obey the triangle
+    inequality, so distances between representatives can not bound the others. Instead each
+    representative gets a lower bound from the gene counts: every gene one genome has more than the
+    other is disjoint and adds the disjoint coefficient, homologous genes never lower the distance.
+    Representatives are visited in order of increasing bound until none of the others can be under
+    the threshold or closer than the best one found. Only valid for the default gene types, whose
+    distances are computed as in DefaultGenome.distance.
+    """
+    def __init__(self, config):
+        self.disjoint_coefficient = config.compatibility_disjoint_coefficient
+        self.sids = []
+        self.representatives = []
+        self.node_counts = []
+        self.connection_counts = []
+
+    def add(self, sid, representative):
+        self.sids.append(sid)
+        self.representatives.append(representative)
+        num_nodes, num_connections = gene_counts(representative)
+        self.node_counts.append(num_nodes)
+        self.connection_counts.append(num_connections)
+
+    def lower_bounds(self, genome):
+        """Returns a lower bound of the distance between the genome and each representative."""
+        num_nodes, num_connections = gene_counts(genome)
+        bound = np.zeros(len(self.sids))
+        # Same operations as the disjoint part of the distance, so the bounds are not rounded up.
+        for counts, n in ((self.node_counts, num_nodes), (self.connection_counts, num_connections)):
+            counts = np.array(counts)
+            max_genes = np.maximum(counts, n)
+            bound = bound + np.where(max_genes > 0, (self.disjoint_coefficient * np.abs(counts - n)) /
+                                     np.maximum(max_genes, 1), 0.0)
+        return bound
+
+    def candidates(self, genomes, threshold, latest=False):
+        """
+        Returns the genomes whose lower bound is under the threshold for any representative, or for
+        the representative added last if latest is True.
+        """
+        if not self.sids:
+            return []
+        if latest:
+            return [g for g in genomes if self.lower_bounds(g)[-1] < threshold]
+        return [g for g in genomes if self.lower_bounds(g).min() < threshold]
+
+    def nearest(self, genome, distances, threshold):
+        """
+        Returns the id of the species with the closest representative under the threshold (the one
+        added first if several are equally close), None if no representative is under the threshold.
+        """
+        bounds = self.lower_bounds(genome)
+        best = None
+        for i in np.argsort(bounds, kind='stable').tolist():
+            if bounds[i] >= threshold or (best is not None and bounds[i] > best[0]):
+                break
+            d = distances(self.representatives[i], genome)
+            if d < threshold and (best is None or (d, i) < best):
+                best = (d, i)
+        return None if best is None else self.sids[best[1]]
+
+
 class DefaultSpeciesSet(DefaultClassConfig):
     """ Encapsulates the default speciation scheme. """
 
@@ -56,6 +204,8 @@ class DefaultSpeciesSet(DefaultClassConfig):
         self.indexer = count(1)
         self.species = {}
         self.genome_to_species = {}
+        # Distances of the genomes of the current generation, see speciate.
+        self.distance_cache = None
 
     @classmethod
     def parse_config(cls, param_dict):
@@ -78,9 +228,14 @@ class DefaultSpeciesSet(DefaultClassConfig):
 
         # Find the best representatives for each existing species.
         unspeciated = set(iterkeys(population))
-        distances = GenomeDistanceCache(config.genome_config)
+        if self.distance_cache is None:
+            self.distance_cache = GenomeDistanceCache(config.genome_config)
+        distances = self.distance_cache
+        hits, misses = distances.hits, distances.misses
         new_representatives = {}
         new_members = {}
+        distances.prefetch([s.representative for s in itervalues(self.species)],
+                           [population[gid] for gid in unspeciated])
         for sid, s in iteritems(self.species):
             candidates = []
             for gid in unspeciated:
@@ -96,20 +251,32 @@ class DefaultSpeciesSet(DefaultClassConfig):
             unspeciated.remove(new_rid)
 
         # Partition population into species based on genetic similarity.
+        index = None
+        if GenomeDistanceEngine.supports(config.genome_config):
+            index = RepresentativeIndex(config.genome_config)
+            for sid, rid in iteritems(new_representatives):
+                index.add(sid, population[rid])
+        candidates = [population[gid] for gid in unspeciated]
+        if index is not None:
+            candidates = index.candidates(candidates, compatibility_threshold)
+        distances.prefetch([population[rid] for rid in itervalues(new_representatives)], candidates)
         while unspeciated:
             gid = unspeciated.pop()
             g = population[gid]
 
             # Find the species with the most similar representative.
-            candidates = []
-            for sid, rid in iteritems(new_representatives):
-                rep = population[rid]
-                d = distances(rep, g)
-                if d < compatibility_threshold:
-                    candidates.append((d, sid))
+            if index is not None:
+                sid = index.nearest(g, distances, compatibility_threshold)
+            else:
+                candidates = []
+                for sid, rid in iteritems(new_representatives):
+                    rep = population[rid]
+                    d = distances(rep, g)
+                    if d < compatibility_threshold:
+                        candidates.append((d, sid))
+                sid = min(candidates, key=lambda x: x[0])[1] if candidates else None
 
-            if candidates:
-                ignored_sdist, sid = min(candidates, key=lambda x: x[0])
+            if sid is not None:
                 new_members[sid].append(gid)
             else:
                 # No species is similar enough, create a new species, using
@@ -117,6 +284,11 @@ class DefaultSpeciesSet(DefaultClassConfig):
                 sid = next(self.indexer)
                 new_representatives[sid] = gid
                 new_members[sid] = [gid]
+                candidates = [population[gid] for gid in unspeciated]
+                if index is not None:
+                    index.add(sid, g)
+                    candidates = index.candidates(candidates, compatibility_threshold, latest=True)
+                distances.prefetch([g], candidates)
 
         # Update species collection based on new speciation.
         self.genome_to_species = {}
@@ -133,11 +305,17 @@ class DefaultSpeciesSet(DefaultClassConfig):
             member_dict = dict((gid, population[gid]) for gid in members)
             s.update(population[rid], member_dict)
 
-        gdmean = mean(itervalues(distances.distances))
-        gdstdev = stdev(itervalues(distances.distances))
+        gdmean = mean(itervalues(distances.requested))
+        gdstdev = stdev(itervalues(distances.requested))
         self.reporters.info(
             'Mean genetic distance {0:.3f}, standard deviation {1:.3f}'.format(gdmean, gdstdev))
 
+        # Only distances between genomes of this generation can be requested again.
+        distances.evict(iterkeys(population))
+        self.reporters.info(
+            'Distance cache: {0:d} hits, {1:d} misses, {2:d} entries kept'.format(
+                distances.hits - hits, distances.misses - misses, len(distances)))
+
     def get_species_id(self, individual_id):
         return self.genome_to_species[individual_id]
 
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+# Final evaluation of the best pairs of all generations. Consecutive best pairs often share a genome or are
+# identical, so every distinct pair (identified by the gene fingerprints of both genomes) is simulated once
+# and its results are used for all generations it occurs in.
+
+# return list of distinct pairs and array with the index of each pair in this list
+def unique_pairs(pairs):
+    unique = {}
+    index = []
+    for ground, aerial in pairs:
+        key = (ground.fingerprint(), aerial.fingerprint())
+        if key not in unique:
+            unique[key] = (len(unique), (ground, aerial))
+        index.append(unique[key][0])
+    return [pair for i, pair in unique.values()], np.array(index, dtype=int)
+
+# simulate each distinct pair num_evals times and return the max, average and min result of each pair
+# as well as the pair with the best average (the last one if several are equally good)
+# simulate: function (list of pairs, num_evals) -> array (pairs, num_evals) with the results
+def evaluate_pairs(pairs, simulate, num_evals):
+    pairs = list(pairs)
+    if len(pairs) == 0:
+        return [], [], [], []
+    unique, index = unique_pairs(pairs)
+    results = np.asarray(simulate(unique, num_evals), dtype=float).reshape(len(unique), num_evals)
+    max_fitn = list(np.amax(results, axis=1)[index])
+    avg_fitn = list(np.average(results, axis=1)[index])
+    min_fitn = list(np.amin(results, axis=1)[index])
+    best = len(avg_fitn) - 1 - int(np.argmax(avg_fitn[::-1]))
+    return max_fitn, avg_fitn, min_fitn, pairs[best]
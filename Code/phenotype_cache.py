@@ -0,0 +1,81 @@
+import os
+import threading
+import weakref
+
+import neat
+
+
+# Stores the phenotype (network) built from each genome, so a genome that takes part in many simulations
+# is translated only once. Entries are identified by the genome key and hold the fingerprint of the genes
+# the phenotype was built from. A genome object that was already seen and not mutated since
+# (see DefaultGenome.version) is a hit without computing its fingerprint, other objects with the key,
+# e.g. copies unpickled in worker processes, are hits if their fingerprint matches.
+# Ground and aerial genomes share their keys, so each population needs its own cache.
+class PhenotypeCache:
+    # create: function (genome, config) -> phenotype
+    def __init__(self, create = neat.nn.FeedForwardNetwork.create):
+        self.create = create
+        self.phenotypes = {}
+        # keys of the entries used since the last call of prune_unused
+        self.used = set()
+        # both populations may use the cache at the same time (concurrent update scheme). Worker processes
+        # forked while the other thread holds the lock get a new one
+        self.lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            cache = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: cache() is not None and cache().reset_lock())
+        self.hits = 0
+        self.misses = 0
+
+    # return phenotype of genome, build it if it is not stored or outdated
+    def get(self, genome, config):
+        version = getattr(genome, 'version', 0)
+        with self.lock:
+            self.used.add(genome.key)
+            entry = self.phenotypes.get(genome.key)
+            if entry is not None and entry[0] is genome and entry[1] == version:
+                self.hits += 1
+                return entry[3]
+            fingerprint = genome.fingerprint()
+            if entry is not None and entry[2] == fingerprint:
+                self.hits += 1
+                self.phenotypes[genome.key] = (genome, version, fingerprint, entry[3])
+                return entry[3]
+            self.misses += 1
+            phenotype = self.create(genome, config)
+            self.phenotypes[genome.key] = (genome, version, fingerprint, phenotype)
+            return phenotype
+
+    # return list with the phenotype of each genome in the list
+    def get_all(self, genomes, config):
+        return [self.get(genome, config) for genome in genomes]
+
+    # remove phenotypes of all genomes whose keys are not in live_keys (e.g. genomes of past generations)
+    def prune(self, live_keys):
+        live_keys = set(live_keys)
+        with self.lock:
+            self._remove_except(live_keys)
+            self.used &= live_keys
+
+    # remove phenotypes of all genomes that were not used since the last call, for processes that do not
+    # know the evaluated population (e.g. the workers of a CoevolutionParallelEvaluator)
+    def prune_unused(self):
+        with self.lock:
+            self._remove_except(self.used)
+            self.used = set()
+
+    def reset_lock(self):
+        self.lock = threading.Lock()
+
+    def _remove_except(self, keys):
+        for key in list(self.phenotypes):
+            if key not in keys:
+                del self.phenotypes[key]
+
+    def __len__(self):
+        return len(self.phenotypes)
+
+    def clear(self):
+        with self.lock:
+            self.phenotypes.clear()
+            self.used.clear()
@@ -3,24 +3,10 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as anim
-import copy
-import multiprocessing
-from ground_robot import Ground_Robot
-from aerial_robot import Aerial_Robot
-from simulator import Simulator
-import os
-import neat
-
-init_pos = ((40,40,np.pi/2)) # starting pose of the robots
-sim_steps = 400
+from recording import Recording
+
 folder_name = '../Results/'
 file_name = 'results_'
-token_per_area = 1
-
-random_inits = False
-rand_token = False
-map_bounded = True
 
 def dist_path(x1,y1,x2,y2):
     return np.sqrt((x1-x2)**2 + (y1-y2)**2)
@@ -32,59 +18,37 @@ def getSpeed(traj):
     return len_path
 
 
-def save_plot(config_ground,config_aerial, load_name, save_name_traj):
-    # load results
-    results = np.load(load_name,allow_pickle=True)
-
-    res = []
-    for i in range(len(results.files)):
-        res.append(results['arr_'+str(i)])
-
-    max_avg, min_avg, avg_avg = res[:3]
-    genome_ground_robot = res[3][0]
-    genome_aerial_robot = res[4][0]
-    avg_of_best_fitness = res[5]
-
-
-    # create robots, simulator, ...
-    map_x = 550
-    map_y = 350
-    simulator = Simulator(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = random_inits, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area,store_traj=True)
-    ground_robots = simulator.ground_robot
-    aerial_robots = simulator.aerial_robot
-
-    token = copy.deepcopy(simulator.token)
-    for s in range(0,sim_steps):
-        simulator.step()
-    print("Finished simulator steps. Token collected: ")
-    print(simulator.ground_robot.collected_token)
-
-
+def save_plot(load_name, save_name_traj):
+    # load recording of the best pair (see record_results.py)
+    recording = Recording.load(load_name)
+    map_x = recording.map_size_x
+    map_y = recording.map_size_y
+    collected_token = recording.collected_token[-1]
+    print("Token collected: ")
+    print(collected_token)
 
     # plot trajectories
+    ground_traj = (recording.ground_pose[:,0], recording.ground_pose[:,1])
+    aerial_traj = (recording.aerial_pose[:,0], recording.aerial_pose[:,1])
     plt.figure()
     rect = plt.Rectangle([0,0],map_x,map_y, facecolor = "black", edgecolor = "black", alpha = 0.1)#, label = "map"
     plt.gca().add_patch(rect)
-    plt.plot(ground_robots.traj[0], ground_robots.traj[1],label='ground robot', color = 'red', zorder = 2)
-    plt.plot(aerial_robots.traj[0], aerial_robots.traj[1], label='aerial robot', color = 'blue', zorder = 1)
-
-
-
-    simtok = simulator.token
-    for tok in simtok:
-        token.remove(tok)
-
+    plt.plot(ground_traj[0], ground_traj[1],label='ground robot', color = 'red', zorder = 2)
+    plt.plot(aerial_traj[0], aerial_traj[1], label='aerial robot', color = 'blue', zorder = 1)
 
-    plt.scatter([x for (x,y) in token],[y for (x,y) in token], s=30, label = "collected token",color = 'black', marker = "o",facecolors = "none", zorder = 3)
-    plt.scatter([x for (x,y) in simulator.token],[y for (x,y) in simulator.token], s=20, label = "uncollected token",marker = "o",color = 'black', zorder = 4)
+    collected = recording.token_collected >= 0
+    token = recording.token_pos[collected]
+    token_left = recording.token_pos[~collected]
+    plt.scatter(token[:,0], token[:,1], s=30, label = "collected token",color = 'black', marker = "o",facecolors = "none", zorder = 3)
+    plt.scatter(token_left[:,0], token_left[:,1], s=20, label = "uncollected token",marker = "o",color = 'black', zorder = 4)
 
-    output_ground = getSpeed(ground_robots.traj)
-    output_aerial = getSpeed(aerial_robots.traj)
+    output_ground = getSpeed(ground_traj)
+    output_aerial = getSpeed(aerial_traj)
 
     plt.axis('scaled')
     plt.xlim(-0.2*map_x,1.2*map_x)
     plt.ylim(-0.2*map_y,1.2*map_y)
-    name= save_name_traj+"_"+str(simulator.ground_robot.collected_token)+"_"+"ri"+str(random_inits)+"_"+"rt"+str(rand_token)+"_"+"mb"+str(map_bounded)
+    name= save_name_traj+"_"+str(collected_token)+"_"+"ri"+str(recording.rand_init)+"_"+"rt"+str(recording.rand_token)+"_"+"mb"+str(recording.map_bounded)
     print(name)
     plt.savefig(name)
     return (output_ground, output_aerial)
@@ -93,15 +57,6 @@ def save_plot(config_ground,config_aerial, load_name, save_name_traj):
 if __name__ == '__main__':
     # init some plot properties
     plt.rcParams.update({'font.size': 16})
-    local_dir = os.path.dirname(__file__)
-    config_ground_file = os.path.join(local_dir, 'config-ground')
-    config_aerial_file = os.path.join(local_dir, 'config-aerial')
-    config_ground = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                         config_ground_file)
-    config_aerial = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                      neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                      config_aerial_file)
 
 
 
@@ -116,9 +71,9 @@ if __name__ == '__main__':
         min_a = None
 
         for i in range(0,5):
-            load_name = folder_name+file_name+str(j)+'_'+str(i)+'.npz'
+            load_name = folder_name+"recordings/"+file_name+str(j)+'_'+str(i)+'.npz'
             save_name_traj =  folder_name +"trajectories/"+file_name+ str(j) + '_'+str(i)
-            gr, ar = save_plot(config_ground,config_aerial, load_name, save_name_traj)
+            gr, ar = save_plot(load_name, save_name_traj)
 
             avg_g.append(np.average(gr))
             avg_a.append(np.average(ar))
@@ -0,0 +1,50 @@
+# simulate the best pair of each results file once and store a recording of the simulation (see recording.py),
+# plot_path.py and plot_animation.py draw their figures from these recordings
+
+import numpy as np
+from simulator import Simulator
+from recording import record
+import os
+import neat
+
+sim_steps = 400 # two time steps per second
+folder_name = '../Results/'
+file_name = 'results_'
+token_per_area = 1
+map_x = 550
+map_y = 350
+
+random_inits = False
+rand_token = False
+map_bounded = True
+
+
+# record the simulation of the best pair in load_name and save it as save_name
+def save_recording(config_ground, config_aerial, load_name, save_name):
+    results = np.load(load_name,allow_pickle=True)
+    genome_ground_robot = results['arr_3'][0]
+    genome_aerial_robot = results['arr_4'][0]
+
+    simulator = Simulator(genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(map_x,map_y), rand_init = random_inits, rand_token = rand_token, map_bounded = map_bounded, token_per_area = token_per_area, collect_metrics = False, num_steps = sim_steps)
+    recording = record(simulator, sim_steps, rand_token)
+    recording.save(save_name)
+    print(save_name + ": " + str(recording.collected_token[-1]) + " token collected")
+
+
+if __name__ == '__main__':
+    local_dir = os.path.dirname(__file__)
+    config_ground_file = os.path.join(local_dir, 'config-ground')
+    config_aerial_file = os.path.join(local_dir, 'config-aerial')
+    config_ground = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         config_ground_file)
+    config_aerial = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                      neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                      config_aerial_file)
+
+    os.makedirs(folder_name+"recordings", exist_ok=True)
+    for j in ["fiftc", "riftc", "firtc", "rirtc", "fifto", "rifto"]:
+        for i in range(0,6):
+            load_name = folder_name+file_name+str(j)+'_'+str(i)+'.npz'
+            save_name = folder_name+"recordings/"+file_name+str(j)+'_'+str(i)+'.npz'
+            save_recording(config_ground, config_aerial, load_name, save_name)
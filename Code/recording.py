@@ -0,0 +1,89 @@
+import numpy as np
+
+
+# Step-by-step record of a simulation, used to draw plots and animations without simulating again.
+# Row s of the per-step arrays holds the state after s time steps (row 0 = start of the simulation):
+# ground_pose, aerial_pose: (steps+1, 3) arrays with x, y, theta of the robots
+# ground_sensors: (steps+1, 8) array with the sensor inputs gi1..gi4, ga1..ga4 of the ground robot
+# aerial_sensors: (steps+1, 14) array with the sensor inputs ai1..ai6, ag1..ag6, acd, aca of the aerial robot
+# collected_token: (steps+1,) array with the number of collected token
+# token_pos: (number of token, 2) array with all token positions
+# token_collected: step in which each token was collected, -1 if it was not collected
+# done_step: step in which the last token was collected, -1 if some token are left
+# ranges: sensor ranges of the robots (c, t, a: ground robot, d, g: aerial robot)
+# map_size_x, map_size_y, rand_init, rand_token, map_bounded: scenario of the simulation
+class Recording:
+    def __init__(self, arrays):
+        self.ground_pose = arrays['ground_pose']
+        self.aerial_pose = arrays['aerial_pose']
+        self.ground_sensors = arrays['ground_sensors']
+        self.aerial_sensors = arrays['aerial_sensors']
+        self.collected_token = arrays['collected_token']
+        self.token_pos = arrays['token_pos']
+        self.token_collected = arrays['token_collected']
+        self.done_step = int(arrays['done_step'])
+        self.ranges = {name: float(arrays['range_'+name]) for name in ['c', 't', 'a', 'd', 'g']}
+        self.map_size_x, self.map_size_y = [float(v) for v in arrays['map_size']]
+        self.rand_init, self.rand_token, self.map_bounded = [bool(v) for v in arrays['scenario']]
+
+    # number of recorded time steps
+    @property
+    def num_steps(self):
+        return len(self.ground_pose) - 1
+
+    # return x and y positions of the token not collected after step s
+    def token_left(self, s):
+        left = (self.token_collected < 0) | (self.token_collected > s)
+        return self.token_pos[left, 0], self.token_pos[left, 1]
+
+    # save recording as compressed .npz file (no pickled objects)
+    def save(self, path):
+        arrays = {'ground_pose': self.ground_pose, 'aerial_pose': self.aerial_pose,
+                  'ground_sensors': self.ground_sensors, 'aerial_sensors': self.aerial_sensors,
+                  'collected_token': self.collected_token, 'token_pos': self.token_pos,
+                  'token_collected': self.token_collected, 'done_step': self.done_step,
+                  'map_size': [self.map_size_x, self.map_size_y],
+                  'scenario': [self.rand_init, self.rand_token, self.map_bounded]}
+        for name, value in self.ranges.items():
+            arrays['range_'+name] = value
+        np.savez_compressed(path, **arrays)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as arrays:
+            return Recording(arrays)
+
+
+# run simulator (a Simulator that was not stepped yet) for num_steps time steps and return the Recording,
+# the simulation continues after all token are collected like in the plots
+# rand_token: whether the token of the simulator were placed randomly (only stored in the recording)
+def record(simulator, num_steps, rand_token = False):
+    g, a = simulator.ground_robot, simulator.aerial_robot
+    ground_pose = np.zeros((num_steps+1, 3))
+    aerial_pose = np.zeros((num_steps+1, 3))
+    ground_sensors = np.zeros((num_steps+1, 8), dtype=np.float32)
+    aerial_sensors = np.zeros((num_steps+1, 14), dtype=np.float32)
+    collected_token = np.zeros(num_steps+1, dtype=np.int32)
+    token_collected = np.full(len(simulator.token_pos), -1, dtype=np.int32)
+    done_step = -1
+
+    for s in range(0, num_steps+1):
+        if s > 0:
+            alive = simulator.token_alive.copy()
+            if simulator.step() == 1 and done_step < 0:
+                done_step = s
+            token_collected[alive & ~simulator.token_alive] = s
+        ground_pose[s] = (g.x_pos, g.y_pos, g.theta)
+        aerial_pose[s] = (a.x_pos, a.y_pos, a.theta)
+        ground_sensors[s] = (g.gi1, g.gi2, g.gi3, g.gi4, g.ga1, g.ga2, g.ga3, g.ga4)
+        aerial_sensors[s] = (a.ai1, a.ai2, a.ai3, a.ai4, a.ai5, a.ai6, a.ag1, a.ag2, a.ag3, a.ag4, a.ag5, a.ag6, a.acd, a.aca)
+        collected_token[s] = g.collected_token
+
+    arrays = {'ground_pose': ground_pose, 'aerial_pose': aerial_pose, 'ground_sensors': ground_sensors,
+              'aerial_sensors': aerial_sensors, 'collected_token': collected_token,
+              'token_pos': simulator.token_pos.copy(), 'token_collected': token_collected, 'done_step': done_step,
+              'map_size': [simulator.map_size_x, simulator.map_size_y],
+              'scenario': [simulator.rand_init, rand_token, simulator.bounded],
+              'range_c': g.c_range, 'range_t': g.t_range, 'range_a': g.a_range,
+              'range_d': a.d_range, 'range_g': a.g_range}
+    return Recording(arrays)
@@ -0,0 +1,130 @@
+# run the evolution for all combinations of run types and run indices in parallel processes
+# (see main.py for a single run), runs whose results exist already are skipped
+
+import numpy as np
+import random
+import traceback
+import contextlib
+import multiprocessing
+import multiprocessing.connection
+import time
+import zlib
+import os
+import neat
+import main
+
+run_types = ["fiftc", "riftc", "firtc", "rirtc", "fifto", "rifto"]
+runs_per_type = 6
+num_processes = None # None = one process per available cpu
+base_seed = 0 # run (run_type, index) uses the seed base_seed + crc32("run_type_index")
+main_settings = {} # globals of main.py set in each run, e.g. {"max_num_gen": 700}
+folder_name = '../Results/'
+timing_name = folder_name+'run_matrix_timing.csv'
+
+
+# return seed of run index of run_type
+def run_seed(run_type, index):
+    return (base_seed + zlib.crc32((run_type+'_'+str(index)).encode())) % (2**32)
+
+# return True if results of the run exist: any of the files main.run writes at the end of a run
+# (results_*.npz, results_best_*.gar, results_full_pop_*.gar) or the .npz files written before the genome
+# archives, so existing results are never overwritten
+def run_finished(run_type, index):
+    name = run_type+'_'+str(index)
+    return any(os.path.exists(folder_name+prefix+name+extension)
+               for prefix in ('results_', 'results_best_', 'results_full_pop_') for extension in ('.npz', '.gar'))
+
+# execute one run in a worker process, its output is written to folder_name/logs/
+# returns (run_type, index, seed, status, seconds)
+def execute_run(job):
+    run_type, index = job
+    seed = run_seed(run_type, index)
+    start = time.time()
+    log_name = folder_name+'logs/run_'+run_type+'_'+str(index)+'.log'
+    with open(log_name, 'a') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            for name, value in main_settings.items():
+                setattr(main, name, value)
+            main.set_run_type(run_type)
+            random.seed(seed)
+            np.random.seed(seed)
+            main.run(load_config('config-ground'), load_config('config-aerial'), index)
+            main.stop_parallel_evaluators()
+            status = 'finished'
+        except Exception:
+            traceback.print_exc()
+            status = 'failed'
+    return run_type, index, seed, status, time.time() - start
+
+# process target of a run: execute it and send the result of execute_run through connection
+def run_process(job, connection):
+    connection.send(execute_run(job))
+    connection.close()
+
+# return neat config read from file name next to this script
+def load_config(name):
+    return neat.Config(main.genome_type(), neat.DefaultReproduction,
+                       neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), name))
+
+# return number of processes used for the runs
+def pool_size():
+    if num_processes is not None:
+        return num_processes
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# run all runs of the matrix that are not finished yet and append their timing to timing_name
+def run_matrix():
+    os.makedirs(folder_name+'logs', exist_ok=True)
+    jobs = []
+    for run_type in run_types:
+        for index in range(0,runs_per_type):
+            if run_finished(run_type, index):
+                print('Skip '+run_type+'_'+str(index)+', results exist')
+            else:
+                jobs.append((run_type, index))
+    if not jobs:
+        return []
+
+    if not os.path.exists(timing_name):
+        with open(timing_name, 'w') as f:
+            f.write('run_type,index,seed,status,seconds\n')
+    processes = min(pool_size(), len(jobs))
+    print('Start '+str(len(jobs))+' runs in '+str(processes)+' processes')
+    results = []
+    # every run gets a fresh process, so no state of main.py is shared between runs. The processes are not
+    # daemonic (unlike those of a multiprocessing.Pool), so a run can start the worker processes of a
+    # parallel evaluator (main_settings with num_workers > 1)
+    running = {}
+    while jobs or running:
+        while jobs and len(running) < processes:
+            job = jobs.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_process, args=(job, sender), name='Run '+job[0]+'_'+str(job[1]))
+            process.start()
+            sender.close()
+            running[process.sentinel] = (job, process, receiver, time.time())
+        for sentinel in multiprocessing.connection.wait(list(running)):
+            job, process, receiver, start = running.pop(sentinel)
+            process.join()
+            try:
+                result = receiver.recv()
+            except EOFError:
+                # the process ended without a result, e.g. it was killed
+                result = (job[0], job[1], run_seed(*job), 'died (exit code '+str(process.exitcode)+')', time.time() - start)
+            receiver.close()
+            run_type, index, seed, status, seconds = result
+            print('Run {0}_{1} {2} after {3:1.1f} minutes'.format(run_type, index, status, seconds/60))
+            with open(timing_name, 'a') as f:
+                f.write('{0},{1},{2},{3},{4:.1f}\n'.format(*result))
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    starting_time = time.time()
+    run_matrix()
+    now = time.time() - starting_time
+    print('Time elapsed in seconds: {:1.1f}, and in minutes: {:1.1f}'.format(now, now/60))
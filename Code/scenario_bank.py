@@ -0,0 +1,33 @@
+from simulator import draw_scenario
+
+
+# Common random numbers for the evaluation of a population: the scenarios (initial poses and token) are drawn
+# once and shared by all genomes, repeat r of every genome is simulated in scenario r. Fitness differences
+# between the genomes then come from their behaviour and not from easier or harder draws, so genomes are
+# compared with less noise at the same number of simulations. A new bank is drawn for every evaluation,
+# so the population is not tuned to a fixed set of scenarios.
+class ScenarioBank:
+    # num_scenarios: number of scenarios (one per repeat)
+    # the other parameters have the same meaning as for Simulator
+    def __init__(self, num_scenarios, arena_size=(550,350), rand_init = False, rand_token = False, token_per_area = 1):
+        self.arena_size = arena_size
+        self.rand_init = rand_init
+        self.rand_token = rand_token
+        self.token_per_area = token_per_area
+        self.scenarios = []
+        self.draw(num_scenarios)
+
+    # replace the scenarios by num_scenarios newly drawn ones
+    def draw(self, num_scenarios):
+        self.scenarios = [draw_scenario(self.arena_size, self.rand_init, self.rand_token, self.token_per_area)
+                          for i in range(0, num_scenarios)]
+
+    def __len__(self):
+        return len(self.scenarios)
+
+    # scenario of a repeat, a slice returns a list of scenarios
+    def __getitem__(self, repeat):
+        return self.scenarios[repeat]
+
+    def __iter__(self):
+        return iter(self.scenarios)
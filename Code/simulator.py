@@ -2,15 +2,68 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as anim
 import copy
+import math
 import multiprocessing
+from collections import namedtuple
 #from ann import ANN
 from ground_robot import Ground_Robot
 from aerial_robot import Aerial_Robot
+from token_grid import Token_Grid
 
 # size of areas
 area_size_x = 150
 area_size_y = 150
 
+# centers of the areas the token are placed in
+area_centers = [(100,90),(275,90),(450,90),(100,260),(275,260),(450,260)]
+# token positions if they are not placed randomly
+fixed_token = [(91,86), (91,261), (274,86), (274,261), (457,86), (457,261)]
+
+# return list of token positions
+# rand_token: True = token_per_area token are placed randomly in each area
+def draw_token_positions(rand_token = False, token_per_area = 1):
+    if not rand_token:
+        return list(fixed_token)
+    token = []
+    for c in area_centers:
+        for i in range(0,token_per_area):
+            token.append((np.random.uniform(c[0]-area_size_x/2,c[0]+area_size_x/2),np.random.uniform(c[1]-area_size_y/2,c[1]+area_size_y/2)))
+    return token
+
+# random initial state of a simulation: start poses (x, y, theta) of both robots and list of token positions
+# (the aerial robot is moved next to the ground robot by the simulators, only its orientation is used)
+Scenario = namedtuple('Scenario', ['ground_pose', 'aerial_pose', 'token'])
+
+# return a Scenario drawn in the order Simulator has always drawn it: ground pose, aerial pose, token
+def draw_scenario(arena_size=(550,350), rand_init = False, rand_token = False, token_per_area = 1):
+    ground_pose = Ground_Robot.draw_start_pose(arena_size, rand_init)
+    aerial_pose = Aerial_Robot.draw_start_pose(arena_size, rand_init)
+    return Scenario(ground_pose, aerial_pose, draw_token_positions(rand_token, token_per_area))
+
+# return distance and relative angle (in robot coordinates, nan at distance 0) from a robot at (x, y) with
+# orientation theta to positions (px, py), element-wise for arrays (same computation as get_distance_and_angle of the robots)
+def distance_and_angle(x, y, theta, px, py):
+    dist = np.sqrt((x-px)**2 + (y-py)**2)
+    # angle between the y axis and the direction to the position
+    angle = np.arctan2(px-x, py-y)
+    angle = np.where(angle < 0, 2*np.pi + angle, angle)
+    # angle in robot coordinates
+    angle = angle - theta
+    angle = np.where(angle < 0, 2*np.pi + angle, angle)
+    return dist, np.where(dist > 0, angle, np.nan)
+
+# return the index of the sensor sector of a robot at (x, y) with orientation theta each position (px, py) lies in,
+# sectors are centered around the robot orientation and each covers 2*pi/num_sectors
+# (positions at distance 0 have no direction, they must be excluded by the caller)
+def sector_index(x, y, theta, px, py, num_sectors):
+    angle = np.arctan2(px-x, py-y) - theta
+    return np.floor(angle*(num_sectors/(2*np.pi)) + 0.5).astype(int) % num_sectors
+
+# return True if simulations with these parameters draw no random numbers, repeated simulations
+# of the same pair of genomes then give identical results
+def is_deterministic(rand_init = False, rand_token = False):
+    return not (rand_init or rand_token)
+
 class Simulator:
     # initialize simulator
     # genome_ground_robot, genome_aerial_robot
@@ -21,43 +74,72 @@ class Simulator:
     # map_bounded: True = bounded, False = unbounded map
     # token_per_area: how many token are located in each area
     # store_traj = True = Robots store their trajectories (usefull for plots)
-    def __init__(self, genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(550,350), rand_init = False, rand_token = False, map_bounded = False, token_per_area = 1,store_traj=False):
+    # compiled_controller: True = ground robot looks its network outputs up in a table (see Compiled_Controller)
+    # net_ground, net_aerial: prebuilt networks of the genomes (e.g. from a PhenotypeCache), None = build them
+    # token_grid: True = token near the robots are found with a Token_Grid (faster for many token)
+    # fast_forward: True = while the sensor inputs of the ground robot can not change, it is moved in closed form
+    # without evaluating its network and token sensors (see plan_coast)
+    # collect_metrics: True = the averages returned by get_behaviour_charac are accumulated (not needed for the fitness)
+    # num_steps: expected number of time steps, used to size the trajectory buffers of the robots
+    # scenario: Scenario with the initial poses and token (e.g. from a ScenarioBank), None = draw a new one
+    def __init__(self, genome_ground_robot, genome_aerial_robot, config_ground, config_aerial, arena_size=(550,350), rand_init = False, rand_token = False, map_bounded = False, token_per_area = 1,store_traj=False, compiled_controller=False, net_ground=None, net_aerial=None, token_grid=False, fast_forward=False, collect_metrics=True, num_steps=None, scenario=None):
 
         self.map_size_x, self.map_size_y = arena_size
         self.timestep = 1
         self.token_per_area = token_per_area
         self.rand_init = rand_init
         self.bounded = map_bounded
+        if scenario is None:
+            scenario = draw_scenario(arena_size, rand_init, rand_token, token_per_area)
         # initialize and setup ground robot
-        self.ground_robot = Ground_Robot(store_traj=store_traj)
-        self.ground_robot.setup((self.map_size_x, self.map_size_y),genome_ground_robot,config_ground, rand_init)
+        self.ground_robot = Ground_Robot(store_traj=store_traj, num_steps=num_steps)
+        self.ground_robot.setup((self.map_size_x, self.map_size_y),genome_ground_robot,config_ground, rand_init, compiled_controller, net_ground, scenario.ground_pose)
         # initialize and setup aerial robot
-        self.aerial_robot = Aerial_Robot(store_traj=store_traj)
-        self.aerial_robot.setup((self.map_size_x, self.map_size_y),genome_aerial_robot,config_aerial, rand_init)
+        self.aerial_robot = Aerial_Robot(store_traj=store_traj, num_steps=num_steps)
+        self.aerial_robot.setup((self.map_size_x, self.map_size_y),genome_aerial_robot,config_aerial, rand_init, net_aerial, scenario.aerial_pose)
         # set aerial robot position near to ground robot
         self.aerial_robot.set_new_pos(self.ground_robot.x_pos+1, self.ground_robot.y_pos+1)
+        # running sums of the behaviour characteristics over num_metric_steps steps
+        self.collect_metrics = collect_metrics
+        self.num_metric_steps = 0
         self.time_in_sensor_range_robots = 0
-        self.avg_dist_in_sensor_range = []
-        self.avg_dist_to_closest_item_ground = []
-        self.avg_dist_to_closest_item_aerial = []
-
-        if rand_token:
-            self.token = []
-            area_centers = [(100,90),(275,90),(450,90),(100,260),(275,260),(450,260)]
-
-            for c in area_centers:
-                for i in range(0,token_per_area):
-                    self.token.append((np.random.uniform(c[0]-area_size_x/2,c[0]+area_size_x/2),np.random.uniform(c[1]-area_size_y/2,c[1]+area_size_y/2)))
-        else:
-            self.token = [(91,86), (91,261), (274,86), (274,261), (457,86), (457,261)]
-
+        self.sum_dist_in_sensor_range = 0.0
+        self.sum_dist_to_closest_item_ground = 0.0
+        self.sum_dist_to_closest_item_aerial = 0.0
+        # distance of the ground robot to the closest token after the last step (None during a coast)
+        self.dist_token_ground = None
+
+        self.max_dist = np.sqrt(self.map_size_x**2+ self.map_size_y**2)
+        # token positions and whether a token is not collected yet
+        self.token_pos = np.array(scenario.token, dtype=float).reshape(-1, 2)
+        self.token_alive = np.ones(len(self.token_pos), dtype=bool)
+        self.update_token_index()
+        self.grid_ground = None
+        self.grid_aerial = None
+        if token_grid:
+            self.grid_ground = Token_Grid(self.token_pos, self.ground_robot.t_range)
+            self.grid_aerial = Token_Grid(self.token_pos, self.aerial_robot.d_range)
+
+        self.fast_forward = fast_forward
+        # current coast of the ground robot (see plan_coast) and velocities already computed for the next step
+        self.coast = None
+        self.coast_positions = []
+        self.next_velocities = None
+
+    # list of positions of the token which are not collected yet
+    @property
+    def token(self):
+        return [tuple(t) for t in self.token_pos[self.token_alive].tolist()]
 
     # simulate one time step for each robot
     def step(self):
 
         # update ground robot
-        self.movement_ground_robot(self.ground_robot)
-        dist_token_ground = self.token_sensors_ground_robot(self.ground_robot)
+        if self.coast is not None:
+            dist_token_ground = self.coast_ground_robot(self.ground_robot)
+        else:
+            self.movement_ground_robot(self.ground_robot)
+            dist_token_ground = self.token_sensors_ground_robot(self.ground_robot)
         self.ar_sensors_ground_robot(self.ground_robot,self.aerial_robot)
         # update aerial robot
         self.movement_aerial_robot(self.aerial_robot)
@@ -65,23 +147,33 @@ class Simulator:
         self.center_sensor_aerial_robot(self.aerial_robot)
         dist_robots = self.gr_sensors_aerial_robot(self.aerial_robot,self.ground_robot)
 
-        # TODO: Needed?
         # calculate behaviour characteristics
-        if dist_robots > 0:
-            self.time_in_sensor_range_robots = self.time_in_sensor_range_robots +1
-            self.avg_dist_in_sensor_range.append(dist_robots)
-        else:
-            self.avg_dist_in_sensor_range.append(2* self.aerial_robot.g_range)
-
-        self.avg_dist_to_closest_item_ground.append(dist_token_ground)
-        self.avg_dist_to_closest_item_aerial.append(dist_token_aerial)
+        if self.collect_metrics:
+            self.num_metric_steps += 1
+            if dist_robots > 0:
+                self.time_in_sensor_range_robots = self.time_in_sensor_range_robots +1
+                self.sum_dist_in_sensor_range += dist_robots
+            else:
+                self.sum_dist_in_sensor_range += 2* self.aerial_robot.g_range
+
+            # during a coast the distance is added by end_coast
+            if dist_token_ground is not None:
+                self.sum_dist_to_closest_item_ground += dist_token_ground
+            self.sum_dist_to_closest_item_aerial += dist_token_aerial
+        self.dist_token_ground = dist_token_ground
+
+        if self.fast_forward:
+            self.plan_coast(self.ground_robot)
 
         # break if all token collected
-        if len(self.token) == 0:
+        if len(self.token_index) == 0:
             return 1
 
     # calculate and return behaviour characteristics
     def get_behaviour_charac(self, timesteps):
+        if not self.collect_metrics:
+            raise RuntimeError("Behaviour characteristics are not collected (collect_metrics = False)")
+        self.end_coast()
         # number of collected items
         a = self.ground_robot.collected_token
 
@@ -90,13 +182,13 @@ class Simulator:
 
         # average distance between robots
         max_dist = np.sqrt(self.map_size_x**2+ self.map_size_y**2)
-        c = np.average(self.avg_dist_in_sensor_range)/max_dist
+        c = self.sum_dist_in_sensor_range/self.num_metric_steps/max_dist
 
         # average distance of ground robot to nearest token
-        d = np.average(self.avg_dist_to_closest_item_ground)/max_dist
+        d = self.sum_dist_to_closest_item_ground/self.num_metric_steps/max_dist
 
         # average distance of aerial robot to nearest token
-        e = np.average(self.avg_dist_to_closest_item_aerial)/max_dist
+        e = self.sum_dist_to_closest_item_aerial/self.num_metric_steps/max_dist
         return [a,b,c,d,e]
 
     # return position of ground robot
@@ -114,7 +206,11 @@ class Simulator:
     # move ground robot (one timestep)
     def movement_ground_robot(self, r):
         # get linear and angular velocity
-        v,w = r.update()
+        if self.next_velocities is not None:
+            v, w = self.next_velocities
+            self.next_velocities = None
+        else:
+            v,w = r.update()
 
         # new robot position
         x_pos_new = r.x_pos + v * self.timestep * np.cos(r.theta)
@@ -145,6 +241,78 @@ class Simulator:
 
         r.set_new_pos(x_pos_new, y_pos_new)
 
+    # Event-driven mode: while no token is in sensor range of the ground robot and the aerial robot sensor
+    # inputs stay the same, the network output of the ground robot and thus (v, w) are constant and the robot
+    # moves on a circular arc. A coast along this arc is started if no token can come into sensor range and
+    # no wall can be reached within at least one step. The aerial robot sensor is still checked every step.
+    def plan_coast(self, r):
+        inputs = (r.gi1, r.gi2, r.gi3, r.gi4, r.ga1, r.ga2, r.ga3, r.ga4)
+        if self.coast is not None:
+            if inputs == self.coast[5] and self.coast_step + 1 <= self.coast_horizon:
+                return
+            # a sensor changed or the coast reached its horizon
+            self.end_coast()
+        if r.gi1 or r.gi2 or r.gi3 or r.gi4:
+            return
+        dist_token = self.dist_token_ground
+
+        # network output for the next step
+        v, w = r.update()
+        speed = abs(v) * self.timestep
+        # small margin for the rounding errors of the closed form
+        margin = 1e-6
+        horizon = np.inf
+        if speed > 0:
+            # steps before a token can come into sensor range
+            horizon = (dist_token - r.t_range - margin) / speed
+            if self.bounded:
+                # steps before the robot can reach a wall
+                wall_dist = min(r.x_pos, self.map_size_x - r.x_pos, r.y_pos, self.map_size_y - r.y_pos)
+                horizon = min(horizon, (wall_dist - margin) / speed)
+        if horizon < 1:
+            self.next_velocities = (v, w)
+            return
+        self.coast = (r.x_pos, r.y_pos, r.theta, v, w, inputs)
+        self.coast_step = 0
+        self.coast_horizon = horizon
+
+    # end the current coast and add the distances to the closest token at each coasted step to the metrics
+    # (no token is collected during a coast, so they are computed for all positions at once)
+    def end_coast(self):
+        self.coast = None
+        if self.coast_positions:
+            # without metrics only the distance at the last position is needed
+            pos = np.array(self.coast_positions if self.collect_metrics else self.coast_positions[-1:])
+            dist = np.sqrt((pos[:, 0, None]-self.token_x)**2 + (pos[:, 1, None]-self.token_y)**2)
+            min_dist = np.full(len(pos), self.max_dist)
+            if dist.shape[1] > 0:
+                min_dist = np.minimum(min_dist, dist.min(axis=1))
+            if self.collect_metrics:
+                self.sum_dist_to_closest_item_ground += float(np.sum(min_dist))
+            self.dist_token_ground = float(min_dist[-1])
+            self.coast_positions = []
+
+    # move ground robot one step along the arc of the current coast, returns None as distance to
+    # the closest token, it is filled in by end_coast
+    def coast_ground_robot(self, r):
+        x0, y0, theta0, v, w, inputs = self.coast
+        self.coast_step += 1
+        k = self.coast_step
+        dw = w * self.timestep
+        # sum of cos(theta0 + i*dw) and sin(theta0 + i*dw) for i = 0..k-1
+        if abs(dw) < 1e-9:
+            sum_cos = k * math.cos(theta0)
+            sum_sin = k * math.sin(theta0)
+        else:
+            f = math.sin(k*dw/2) / math.sin(dw/2)
+            sum_cos = f * math.cos(theta0 + (k-1)*dw/2)
+            sum_sin = f * math.sin(theta0 + (k-1)*dw/2)
+
+        r.theta = (theta0 + k*dw) % (2*np.pi)
+        r.set_new_pos(x0 + v * self.timestep * sum_cos, y0 + v * self.timestep * sum_sin)
+        self.coast_positions.append((r.x_pos, r.y_pos))
+        return None
+
     # move aerial robot (one timestep)
     def movement_aerial_robot(self, a):
         x_pos, y_pos, rot = a.update()
@@ -178,35 +346,89 @@ class Simulator:
 
         a.set_new_pos(x_pos_new, y_pos_new)
 
+    # store indices and coordinates of the token which are not collected yet
+    def update_token_index(self):
+        self.token_index = np.flatnonzero(self.token_alive)
+        self.token_x = self.token_pos[self.token_index, 0]
+        self.token_y = self.token_pos[self.token_index, 1]
+
+    # return indices of the token which are not collected and may be within radius of robot
+    def token_candidates(self, robot, radius, grid):
+        if grid is None:
+            return self.token_index
+        index = grid.candidates(robot.x_pos, robot.y_pos, radius)
+        return index[self.token_alive[index]]
+
+    # return distances from robot to the token with the given indices
+    def token_distances(self, robot, index):
+        if index is self.token_index:
+            token_x, token_y = self.token_x, self.token_y
+        else:
+            token_x, token_y = self.token_pos[index, 0], self.token_pos[index, 1]
+        return np.sqrt((robot.x_pos-token_x)**2 + (robot.y_pos-token_y)**2)
+
+    # return the sensor sectors of robot the token with the given indices lie in (a list for few token)
+    def token_sectors(self, robot, index, num_sectors):
+        pos = self.token_pos[index]
+        if len(index) > 8:
+            return sector_index(robot.x_pos, robot.y_pos, robot.theta, pos[:, 0], pos[:, 1], num_sectors)
+        # for few token the same computation is faster without numpy
+        scale = num_sectors/(2*np.pi)
+        return [int(math.floor((math.atan2(px-robot.x_pos, py-robot.y_pos) - robot.theta)*scale + 0.5)) % num_sectors
+                for px, py in pos.tolist()]
+
+    # return distance from robot to the closest of the token with the given indices, dist contains the distances
+    # to the candidates found within radius (when a grid is used, other token are only checked if needed)
+    def closest_token(self, robot, index, dist, radius, grid):
+        min_dist = self.max_dist
+        if len(dist) > 0:
+            min_dist = min(min_dist, dist.min())
+        if grid is not None and min_dist >= radius and len(index) > 0:
+            min_dist = min(min_dist, self.token_distances(robot, index).min())
+        return min_dist
+
     # set token sensor values for ground robot
     def token_sensors_ground_robot(self,r):
-        # check whether position of robot is near to token
-        r.gi1 = 0
-        r.gi2 = 0
-        r.gi3 = 0
-        r.gi4 = 0
-        # set min_dist to maximum distance
-        min_dist = np.sqrt(self.map_size_x**2+ self.map_size_y**2)
-        # check distance to each token
-        for t in self.token:
-            dist, angle = r.get_distance_and_angle((t[0],t[1]))
-            if dist < min_dist:
-                min_dist = dist
-            # collect token if token is in collection range
-            if (dist < r.c_range):
-                self.token.remove(t)
-                r.collected_token = r.collected_token+1
-            # set gi input values
-            elif (dist < r.t_range):
-                if angle < np.pi/4 or angle > 7*np.pi/4:
-                    r.gi1 = 1
-                elif angle < 3* np.pi/4:
-                    r.gi2 = 1
-                elif angle < 5* np.pi/4:
-                    r.gi3 = 1
-                elif angle < 7 * np.pi /4:
-                    r.gi4 = 1
-        return min_dist
+        alive = self.token_index
+        index = self.token_candidates(r, r.t_range, self.grid_ground)
+        dist = self.token_distances(r, index)
+
+        # collect token in collection range. The token following a collected one in the token list is neither sensed
+        # nor collected in the same step (the original implementation removed token from the list while iterating it).
+        collect = dist < r.c_range
+        collecting = collect.any()
+        skipped = []
+        if collecting:
+            evaluated = np.ones(len(index), dtype=bool)
+            for j in np.flatnonzero(collect):
+                if not evaluated[j]:
+                    continue
+                following = np.searchsorted(alive, index[j]) + 1
+                if following < len(alive):
+                    skipped.append(alive[following])
+                    k = np.searchsorted(index, alive[following])
+                    if k < len(index) and index[k] == alive[following]:
+                        evaluated[k] = False
+            collect &= evaluated
+            self.token_alive[index[collect]] = False
+            self.update_token_index()
+            r.collected_token = r.collected_token + int(collect.sum())
+
+        # set gi input values
+        sensed = dist < r.t_range
+        if collecting:
+            sensed &= evaluated & ~collect
+        gi = [0, 0, 0, 0]
+        if sensed.any():
+            for k in set(self.token_sectors(r, index[sensed], 4)):
+                gi[k] = 1
+        r.gi1, r.gi2, r.gi3, r.gi4 = gi
+
+        # distance to the closest token (skipped token are not considered)
+        if skipped:
+            dist = dist[evaluated]
+            alive = np.setdiff1d(alive, skipped)
+        return self.closest_token(r, alive, dist, r.t_range, self.grid_ground)
 
     # set sensor values of ground robot to detect aerial robot
     def ar_sensors_ground_robot(self, r, a):
@@ -229,38 +451,27 @@ class Simulator:
 
     # set the token sensor values of the aerial robot
     def token_sensors_aerial_robot(self, a, r):
-        a.ai1 = 0
-        a.ai2 = 0
-        a.ai3 = 0
-        a.ai4 = 0
-        a.ai5 = 0
-        a.ai6 = 0
-        min_dist = np.sqrt(self.map_size_x**2+ self.map_size_y**2)
-        for t in self.token:
-            dist, angle = a.get_distance_and_angle((t[0], t[1]))
-            if dist < min_dist:
-                min_dist = dist
-            rel_dist = 1-dist/a.d_range
-            if (dist < a.d_range):
-                if angle < np.pi/6 or angle > 11* np.pi/6:
-                    if rel_dist > a.ai1:
-                        a.ai1 = rel_dist
-                elif angle < 3*np.pi/6:
-                    if rel_dist > a.ai2:
-                        a.ai2 = rel_dist
-                elif angle < 5*np.pi/6:
-                    if rel_dist > a.ai3:
-                        a.ai3 = rel_dist
-                elif angle < 7*np.pi/6:
-                    if rel_dist > a.ai4:
-                        a.ai4 = rel_dist
-                elif angle < 9*np.pi/6:
-                    if rel_dist > a.ai5:
-                        a.ai5 = rel_dist
-                elif angle < 11*np.pi/6:
-                    if rel_dist > a.ai6:
-                        a.ai6 = rel_dist
-        return min_dist
+        index = self.token_candidates(a, a.d_range, self.grid_aerial)
+        dist = self.token_distances(a, index)
+        in_range = dist < a.d_range
+
+        # ai input values are the relative distance of the closest token in each sector
+        # (a token at distance 0 is in no sector)
+        ai = [0, 0, 0, 0, 0, 0]
+        if in_range.any():
+            rel_dist = 1-dist[in_range]/a.d_range
+            sectors = self.token_sectors(a, index[in_range], 6)
+            if len(sectors) > 8:
+                maxima = np.zeros(6)
+                np.maximum.at(maxima, sectors, np.where(rel_dist < 1, rel_dist, 0))
+                ai = maxima.tolist()
+            else:
+                for k, d in zip(sectors, rel_dist.tolist()):
+                    if d > ai[k] and d < 1:
+                        ai[k] = d
+        a.ai1, a.ai2, a.ai3, a.ai4, a.ai5, a.ai6 = ai
+
+        return self.closest_token(a, self.token_index, dist, a.d_range, self.grid_aerial)
 
     # set sensor values of aerial robot to detect the ground robot
     def gr_sensors_aerial_robot(self, a, r):
@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+# the scripts in Code/ are imported as top-level modules
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+import neat
+
+
+def load_config(name, genome_type=neat.DefaultGenome):
+    return neat.Config(genome_type, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                       neat.DefaultStagnation, os.path.join(CODE_DIR, name))
+
+
+@pytest.fixture
+def config_ground():
+    return load_config('config-ground')
+
+
+@pytest.fixture
+def config_aerial():
+    return load_config('config-aerial')
+
+
+def random_genomes(config, num_genomes, num_mutations, seed=0):
+    """Returns genomes with hidden nodes and connections added by random structural mutations."""
+    random.seed(seed)
+    np.random.seed(seed)
+    genomes = []
+    for key in range(1, num_genomes+1):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for i in range(random.randint(0, num_mutations)):
+            genome.mutate(config.genome_config)
+            genome.mutate_add_connection(config.genome_config)
+            if i % 3 == 0:
+                genome.mutate_add_node(config.genome_config)
+        genomes.append(genome)
+    return genomes
@@ -0,0 +1,17 @@
+import numpy as np
+
+import neat
+
+from conftest import random_genomes
+
+
+def test_batched_networks_equal_feed_forward(config_ground, config_aerial):
+    rng = np.random.RandomState(0)
+    for config in (config_ground, config_aerial):
+        genomes = random_genomes(config, 40, 30)
+        nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+        batched = neat.nn.BatchedNetworks(nets)
+        for i in range(10):
+            inputs = rng.uniform(-1, 1, (len(nets), len(config.genome_config.input_keys)))
+            expected = [net.activate(list(x)) for net, x in zip(nets, inputs)]
+            assert np.allclose(batched.activate(inputs), expected, rtol=0, atol=1e-12)
@@ -0,0 +1,41 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+import neat
+
+from conftest import load_config
+
+
+def eval_genomes(pop, ind, config_ground, config_aerial, type=0):
+    for genome_id, genome in pop:
+        genome.fitness = random.random()
+
+
+def run(population, num_generations, checkpointer=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        population.run(eval_genomes, num_generations, checkpointer=checkpointer)
+
+
+def test_resume_checks_configs_and_run(tmp_path):
+    config_ground, config_aerial = load_config('config-ground'), load_config('config-aerial')
+    random.seed(1)
+    np.random.seed(1)
+    prefix = str(tmp_path / 'checkpoint_')
+    p = neat.Population(config_ground, config_aerial)
+    run(p, 4, neat.CoevolutionCheckpointer(2, filename_prefix=prefix, run_description={'run_type': 'rirtc'}))
+    checkpoint = neat.CoevolutionCheckpointer.latest_checkpoint(prefix)
+
+    q = neat.CoevolutionCheckpointer.restore_checkpoint(checkpoint, config_ground, config_aerial, {'run_type': 'rirtc'})
+    run(q, 4 - q.generation_ground)
+    assert [g.fingerprint() for g in q.population_ground.values()] == [g.fingerprint() for g in p.population_ground.values()]
+
+    with pytest.raises(RuntimeError, match='run_description'):
+        neat.CoevolutionCheckpointer.restore_checkpoint(checkpoint, config_ground, config_aerial, {'run_type': 'fiftc'})
+    other = load_config('config-ground')
+    other.pop_size += 1
+    with pytest.raises(RuntimeError, match='config_ground'):
+        neat.CoevolutionCheckpointer.restore_checkpoint(checkpoint, other, config_aerial, {'run_type': 'rirtc'})
@@ -0,0 +1,47 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+
+import neat
+from generation_log import GenerationLog
+
+from conftest import load_config
+
+
+def eval_genomes(pop, ind, config_ground, config_aerial, type=0):
+    for genome_id, genome in pop:
+        genome.fitness = random.random()
+
+
+def run(num_generations, generation_log=None, checkpointer=None):
+    random.seed(1)
+    np.random.seed(1)
+    p = neat.Population(load_config('config-ground'), load_config('config-aerial'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = p.run(eval_genomes, num_generations, generation_log=generation_log, checkpointer=checkpointer)
+    return p, result
+
+
+def test_fitness_series_read_from_log(tmp_path):
+    _, reference = run(4)
+
+    log = GenerationLog(str(tmp_path / 'log'))
+    p, result = run(4, log, neat.CoevolutionCheckpointer(2, filename_prefix=str(tmp_path / 'checkpoint_')))
+    log.close()
+    assert p.max_fitn == p.min_fitn == p.avg_fitn == []
+    for i in (3, 4, 5):
+        assert result[i] == [float(x) for x in reference[i]]
+    assert len(result[2]) == len(reference[2]) == 8
+
+    # a resumed run continues the series of the log
+    q = neat.CoevolutionCheckpointer.restore_checkpoint(str(tmp_path / 'checkpoint_2'), load_config('config-ground'),
+                                                        load_config('config-aerial'))
+    assert q.max_fitn == []
+    log = GenerationLog(str(tmp_path / 'log'), 2*q.generation_ground)
+    with contextlib.redirect_stdout(io.StringIO()):
+        resumed = q.run(eval_genomes, 4 - q.generation_ground, generation_log=log)
+    log.close()
+    assert len(resumed[3]) == 8
+    assert resumed[3][:4] == result[3][:4]
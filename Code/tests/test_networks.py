@@ -0,0 +1,17 @@
+import random
+
+import neat
+import numpy as np
+
+from conftest import random_genomes
+
+
+def test_compiled_network_equals_feed_forward(config_ground, config_aerial):
+    for config in (config_ground, config_aerial):
+        num_inputs = len(config.genome_config.input_keys)
+        for genome in random_genomes(config, 30, 30):
+            net = neat.nn.FeedForwardNetwork.create(genome, config)
+            compiled = neat.nn.CompiledFeedForwardNetwork.create(genome, config)
+            for i in range(10):
+                inputs = [random.uniform(-1, 1) for k in range(num_inputs)]
+                assert np.allclose(compiled.activate(inputs), net.activate(inputs), rtol=0, atol=1e-12)
@@ -0,0 +1,55 @@
+import numpy as np
+
+import main
+
+
+def test_non_survivor_never_outranks_survivor():
+    rng = np.random.RandomState(0)
+    for trial in range(200):
+        n = rng.randint(2, 20)
+        provisional = rng.uniform(0, 1, n)
+        survivors = sorted(rng.choice(n, rng.randint(1, n+1), replace=False))
+        full_mean = rng.uniform(0, 1, len(survivors))
+        fitness = main.racing_fitness(provisional, survivors, full_mean)
+        others = [i for i in range(n) if i not in survivors]
+        assert list(fitness[survivors]) == list(full_mean)
+        if others:
+            assert fitness[others].max() < fitness[survivors].min()
+            assert (fitness[others] <= provisional[others]).all()
+            # the order of the non-survivors is kept
+            order = np.argsort(provisional[others], kind='stable')
+            assert (np.diff(fitness[others][order]) >= 0).all()
+
+
+def test_best_genome_is_survivor():
+    # provisional mean of a non-survivor above all full means, equal to the lowest one
+    for high in (0.9, 0.2):
+        fitness = main.racing_fitness([high, 0.5, 0.3, 0.1], [1, 2], [0.4, 0.2])
+        assert int(np.argmax(fitness)) == 1
+        assert fitness[3] < fitness[0] < 0.2
+
+
+def test_non_survivors_below_survivors_unchanged():
+    fitness = main.racing_fitness([0.1, 0.5, 0.05], [1], [0.3])
+    assert list(fitness) == [0.1, 0.3, 0.05]
+
+
+class Genome:
+    def __init__(self, key):
+        self.key = key
+        self.fitness = None
+
+
+def test_eval_genomes_racing_flags(monkeypatch):
+    # genome i gets the result i in each simulation, the initial race keeps the best half
+    def simulate_genomes(genomes, ind, config_ground, config_aerial, type, num_evals, scenarios=None):
+        return np.array([[float(g.key)] * num_evals for g in genomes])
+    monkeypatch.setattr(main, 'simulate_genomes', simulate_genomes)
+    monkeypatch.setattr(main, 'use_scenario_bank', False)
+    monkeypatch.setattr(main, 'racing_keep_fraction', 0.5)
+    genomes = [Genome(k) for k in range(6)]
+    main.eval_genomes_racing(genomes, None, None, None)
+    num_evals = main.num_simulations(main.num_evals_per_pair)
+    assert [g.fitness_full for g in genomes] == [False]*3 + [True]*3
+    assert [g.fitness_evals for g in genomes] == [main.racing_initial_repeats]*3 + [num_evals]*3
+    assert max(g.fitness for g in genomes[:3]) < min(g.fitness for g in genomes[3:])
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from batch_simulator import BatchSimulator
+from conftest import CODE_DIR, load_config
+from genome_archive import load_genomes
+from simulator import Simulator, draw_scenario
+
+NUM_STEPS = 400
+ARENA_SIZE = (550, 350)
+# (rand_init, rand_token, map_bounded, token_per_area) of the scenarios, see main.set_run_type
+SCENARIOS = [(False, False, True, 1), (True, True, True, 1), (True, True, False, 3)]
+
+
+@pytest.fixture(scope='module')
+def configs():
+    return load_config('config-ground'), load_config('config-aerial')
+
+
+@pytest.fixture(scope='module')
+def pairs():
+    # evolved best pairs of several generations, so that token are actually collected
+    pairs = []
+    for run in ('fiftc_0', 'rirtc_0'):
+        best = load_genomes(CODE_DIR + '/../Results/results_best_' + run)['arr_0']
+        pairs += [tuple(best[i]) for i in range(0, len(best), 200)]
+    return pairs
+
+
+def cases(pairs, seed=0):
+    """Yields (pair, scenario settings, Scenario) for every pair in every scenario, drawn with a fixed seed."""
+    np.random.seed(seed)
+    for settings in SCENARIOS:
+        for pair in pairs:
+            rand_init, rand_token, map_bounded, token_per_area = settings
+            yield pair, settings, draw_scenario(ARENA_SIZE, rand_init, rand_token, token_per_area)
+
+
+def simulate(pair, settings, scenario, configs, **options):
+    rand_init, rand_token, map_bounded, token_per_area = settings
+    simulator = Simulator(pair[0], pair[1], configs[0], configs[1], arena_size=ARENA_SIZE, rand_init=rand_init,
+                          rand_token=rand_token, map_bounded=map_bounded, token_per_area=token_per_area,
+                          num_steps=NUM_STEPS, scenario=scenario, **options)
+    for i in range(NUM_STEPS):
+        if simulator.step() == 1:
+            break
+    robot = simulator.ground_robot
+    return robot.collected_token, (robot.x_pos, robot.y_pos, robot.theta)
+
+
+def simulate_all(pairs, configs, **options):
+    """Returns the collected token and the final pose of the ground robot in every case."""
+    results = [simulate(pair, settings, scenario, configs, **options) for pair, settings, scenario in cases(pairs)]
+    return [r[0] for r in results], np.array([r[1] for r in results])
+
+
+def test_scenarios_collect_token(pairs, configs):
+    assert sum(simulate_all(pairs, configs)[0]) > 0
+
+
+def test_batch_simulator_equals_simulator(pairs, configs):
+    expected, expected_poses = simulate_all(pairs, configs)
+    result = []
+    poses = []
+    all_cases = list(cases(pairs))
+    for settings in SCENARIOS:
+        group = [(pair, scenario) for pair, s, scenario in all_cases if s == settings]
+        rand_init, rand_token, map_bounded, token_per_area = settings
+        simulator = BatchSimulator([p[0] for p, s in group], [p[1] for p, s in group], configs[0], configs[1],
+                                   arena_size=ARENA_SIZE, rand_init=rand_init, rand_token=rand_token,
+                                   map_bounded=map_bounded, token_per_area=token_per_area,
+                                   scenarios=[s for p, s in group])
+        result += list(simulator.run(NUM_STEPS))
+        poses += list(simulator.ground_pose)
+    assert result == expected
+    # no scenario is finished early, so all robots moved for NUM_STEPS steps
+    assert np.array_equal(np.array(poses), expected_poses)
+
+
+def test_compiled_controller_equals_network(pairs, configs):
+    token, poses = simulate_all(pairs, configs, compiled_controller=True)
+    expected, expected_poses = simulate_all(pairs, configs)
+    assert token == expected
+    assert np.array_equal(poses, expected_poses)
+
+
+def test_token_grid_equals_token_scan(pairs, configs):
+    token, poses = simulate_all(pairs, configs, token_grid=True)
+    expected, expected_poses = simulate_all(pairs, configs)
+    assert token == expected
+    assert np.array_equal(poses, expected_poses)
+
+
+def test_fast_forward_equals_stepping(pairs, configs):
+    token, poses = simulate_all(pairs, configs, fast_forward=True)
+    expected, expected_poses = simulate_all(pairs, configs)
+    assert token == expected
+    # closed-form motion rounds differently than stepping
+    assert np.allclose(poses, expected_poses, rtol=0, atol=1e-6)
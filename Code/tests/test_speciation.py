@@ -0,0 +1,50 @@
+import random
+
+import neat
+import numpy as np
+from neat.distance import GenomeDistanceEngine
+from neat.reporting import ReporterSet
+
+from conftest import load_config, random_genomes
+
+
+def genome_configs():
+    for genome_type in (neat.DefaultGenome, neat.ArrayGenome):
+        yield load_config('config-ground', genome_type)
+
+
+def test_distance_engine_equals_genome_distance():
+    for config in genome_configs():
+        genomes = random_genomes(config, 25, 20)
+        engine = GenomeDistanceEngine(config.genome_config)
+        distances = engine.distances(genomes[:10], genomes)
+        expected = [[g0.distance(g1, config.genome_config) for g1 in genomes] for g0 in genomes[:10]]
+        assert np.array_equal(distances, expected)
+
+
+def speciate_generations(config, num_generations):
+    """Speciates a population that is mutated between generations, returns the species of every genome."""
+    genomes = random_genomes(config, 80, 15, seed=1)
+    random.seed(2)
+    np.random.seed(2)
+    species_set = neat.DefaultSpeciesSet(config.species_set_config, ReporterSet())
+    assignments = []
+    for generation in range(num_generations):
+        population = dict((g.key, g) for g in genomes)
+        species_set.speciate(config, population, generation)
+        assignments.append(sorted(species_set.genome_to_species.items()))
+        for g in genomes:
+            g.mutate(config.genome_config)
+    return assignments
+
+
+def test_pruned_speciation_equals_full_scan(monkeypatch):
+    for config in genome_configs():
+        # a low threshold gives many species, so that pruning skips representatives
+        config.species_set_config.compatibility_threshold = 1.5
+        pruned = speciate_generations(config, 5)
+        with monkeypatch.context() as m:
+            m.setattr(GenomeDistanceEngine, 'supports', staticmethod(lambda config: False))
+            full = speciate_generations(config, 5)
+        assert len(set(sid for a in pruned for gid, sid in a)) > 5
+        assert pruned == full
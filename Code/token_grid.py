@@ -0,0 +1,35 @@
+import numpy as np
+
+
+# Uniform grid over the token positions, used to find the token near a robot without looking at all token.
+# The cell size should be the sensor range the grid is queried with, a query then touches at most 3x3 cells.
+class Token_Grid:
+    # positions: array (number of token, 2) with the token positions
+    # cell_size: edge length of the square cells
+    def __init__(self, positions, cell_size):
+        self.cell_size = cell_size
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        cells = np.floor(positions / cell_size).astype(int)
+        # token indices of each non-empty cell in ascending order
+        self.cells = {}
+        for i, (cx, cy) in enumerate(cells.tolist()):
+            self.cells.setdefault((cx, cy), []).append(i)
+        for cell in self.cells:
+            self.cells[cell] = np.array(self.cells[cell], dtype=int)
+
+    # return sorted indices of all token in cells overlapping the square of half edge length radius around (x, y),
+    # this includes all token with a distance below radius
+    def candidates(self, x, y, radius):
+        x0, x1 = int(np.floor((x-radius) / self.cell_size)), int(np.floor((x+radius) / self.cell_size))
+        y0, y1 = int(np.floor((y-radius) / self.cell_size)), int(np.floor((y+radius) / self.cell_size))
+        found = []
+        for cx in range(x0, x1+1):
+            for cy in range(y0, y1+1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    found.append(cell)
+        if not found:
+            return np.zeros(0, dtype=int)
+        if len(found) == 1:
+            return found[0]
+        return np.sort(np.concatenate(found))